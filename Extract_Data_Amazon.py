@@ -13,6 +13,8 @@ from nltk.corpus import stopwords
 from nltk.stem import WordNetLemmatizer
 import spacy
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from scrape import scrape_reviews
+from sites import AMAZON
 
 st.set_page_config(page_title='Product Summarization')
 st.title('Product Review Summarisation')
@@ -32,39 +34,8 @@ def main_file(webpage, page_number, pages_to_extract):
 
         """
 
-        webpage = webpage[:-1]
-        amazon_review = []
-        amazon_date = []
-        amazon_summary = []
-
-        def scrape_data_amazon(webpage, page_number, pages_to_extract):
-            next_page = webpage + str(page_number)
-            response = requests.get(str(next_page))
-            soup = BeautifulSoup(response.content, "html.parser")
-            soup_review = soup.findAll("div", {"class": "a-row a-spacing-small review-data"})
-            soup_summary = soup.findAll("a", {
-                "class": "a-size-base a-link-normal review-title a-color-base review-title-content a-text-bold"})
-            soup_date = soup.findAll("span", {"class": "a-size-base a-color-secondary review-date"})[2:]  # 10 reviews
-            for x in range(len(soup_review)):
-                amazon_review.append(soup_review[x].text.strip())
-                amazon_date.append(soup_date[x].text.strip())
-                amazon_summary.append(soup_summary[x].text.strip())
-
-            # Generating the next page url
-            if page_number < pages_to_extract:
-                page_number = page_number + 1
-                # print(page_number)
-                scrape_data_amazon(webpage, page_number, pages_to_extract)
-
-        scrape_data_amazon(webpage, page_number, pages_to_extract)
-        data_amazon = {'Date': amazon_date, 'Review': amazon_review, 'Summary': amazon_summary}
-        df_amazon = pd.DataFrame(data_amazon, columns=['Date', 'Review', 'Summary'])
-
-        def get_date_amazon(text):
-            return ' '.join(text.split()[-3:])
-
-        df_amazon["Date"] = [get_date_amazon(x) for x in df_amazon["Date"].values]
-        df_amazon.dropna(inplace=True)
+        # Amazon pages go through the shared fetch / parse / cache core of scrape.py
+        df_amazon = scrape_reviews(AMAZON, webpage, page_number, pages_to_extract)
 
         return df_amazon
 
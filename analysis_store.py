@@ -0,0 +1,173 @@
+"""
+Precomputed analyses of the DATABASE_FILES products, so the dashboard does not rerun the
+pipeline on inputs that never change
+
+    python analysis_store.py                 # every product whose analysis is missing or stale
+    python analysis_store.py "iPhone 15" --force
+
+Each analysis is a Parquet file in ANALYSIS_DIR with a JSON sidecar recording the source CSV
+(size, mtime, sha256) and the analysis_version it was computed with. load_analysis returns
+None as soon as either differs, and the dashboard falls back to running the pipeline.
+
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from importlib import metadata
+
+import pandas as pd
+
+from aspect_extraction import SPACY_MODEL, SPACY_KEEP_COMPONENTS, ASPECT_RULES_VERSION
+from review_pipeline import PIPELINE_VERSION
+from sentiment import SENTIMENT_MODEL, sentiment_revision
+
+# Available CSV files for database option
+DATABASE_FILES = {
+    "iPhone 15": "iphone_15.csv",
+    "JBL Earbuds": "jbl_earbuds.csv",
+    "MacBook": "macbook.csv",
+    "Motorola Moto G85": "motorola_moto_G85.csv"
+}
+
+# Directory of the precomputed analyses
+ANALYSIS_DIR = ".analysis"
+
+
+def _package_version(name):
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def analysis_version(spacy_components=SPACY_KEEP_COMPONENTS, sentiment_model_revision=None):
+    """
+    Everything the analysis output depends on besides the source CSV: the pipeline and rules
+    versions, the spaCy model, its version and components, and the sentiment model and its
+    revision. Read from the installed package metadata and the Hugging Face cache (unless the
+    revision of a loaded model is given), so checking it does not load any model.
+
+    """
+    return {
+        "pipeline": PIPELINE_VERSION,
+        "rules": ASPECT_RULES_VERSION,
+        "spacy": _package_version("spacy"),
+        "spacy_model": SPACY_MODEL,
+        "spacy_model_version": _package_version(SPACY_MODEL),
+        "spacy_components": list(spacy_components),
+        "transformers": _package_version("transformers"),
+        "sentiment_model": SENTIMENT_MODEL,
+        "sentiment_model_revision": sentiment_model_revision or sentiment_revision(SENTIMENT_MODEL),
+    }
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _store_paths(csv_path, directory=ANALYSIS_DIR):
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(directory, f"{stem}.parquet"), os.path.join(directory, f"{stem}.json")
+
+
+def load_analysis(csv_path, version=None, directory=ANALYSIS_DIR):
+    """
+    Precomputed analysis of csv_path, or None when there is none or it is stale: computed
+    with another analysis_version, or from a CSV that has changed since. An unchanged size
+    and mtime are trusted, otherwise the contents are hashed.
+
+    """
+    parquet_path, meta_path = _store_paths(csv_path, directory)
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    if meta["version"] != (version or analysis_version()):
+        return None
+    stat = os.stat(csv_path)
+    if (stat.st_size, stat.st_mtime_ns) != (meta["size"], meta["mtime"]):
+        if stat.st_size != meta["size"] or _file_sha256(csv_path) != meta["sha256"]:
+            return None
+
+    try:
+        return pd.read_parquet(parquet_path)
+    except FileNotFoundError:
+        return None
+
+
+def save_analysis(csv_path, frame, version=None, directory=ANALYSIS_DIR):
+    """Stores the analysis of csv_path, the sidecar is written last so a partial write is never loaded"""
+    parquet_path, meta_path = _store_paths(csv_path, directory)
+    os.makedirs(directory, exist_ok=True)
+    stat = os.stat(csv_path)
+    meta = {"source": csv_path, "size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": _file_sha256(csv_path),
+            "version": version or analysis_version(), "rows": len(frame), "created": time.time()}
+
+    frame.to_parquet(f"{parquet_path}.tmp", index=False)
+    os.replace(f"{parquet_path}.tmp", parquet_path)
+    with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(f"{meta_path}.tmp", meta_path)
+
+
+def precompute(products=None, force=False, spacy_n_process=1):
+    """Runs the pipeline over the CSV of every product (default: all DATABASE_FILES) whose analysis is stale"""
+    from aspect_extraction import load_nlp, aspect_namespace
+    from corpus_store import load_reviews
+    from normalizer import downloads, build_lemmatizer, build_stopwords
+    from review_pipeline import analyze_reviews
+    from sentence_cache import SentenceCache
+    from sentiment import load_sentiment_pipeline, sentiment_namespace
+
+    version = analysis_version()
+    todo = [name for name in (products or DATABASE_FILES)
+            if force or load_analysis(DATABASE_FILES[name], version) is None]
+    for name in (products or DATABASE_FILES):
+        if name not in todo:
+            print(f"{name}: up to date")
+    if not todo:
+        return
+
+    downloads()
+    lemma, stopword_set = build_lemmatizer(), build_stopwords()
+    nlp = load_nlp(SPACY_MODEL, keep=SPACY_KEEP_COMPONENTS)
+    sentiment_pipe = load_sentiment_pipeline()
+    # loading may have fetched a newer snapshot, the analyses record the revision actually used
+    version = analysis_version(sentiment_model_revision=getattr(sentiment_pipe.model.config, "_commit_hash", None))
+    aspect_cache = SentenceCache(aspect_namespace(nlp))
+    sentiment_cache = SentenceCache(sentiment_namespace(sentiment_pipe))
+
+    for name in todo:
+        csv_path = DATABASE_FILES[name]
+        start = time.perf_counter()
+        df = load_reviews(csv_path)
+        df.dropna(inplace=True)
+        frame = analyze_reviews(df, nlp, sentiment_pipe, lemma, stopword_set, spacy_n_process=spacy_n_process,
+                                aspect_cache=aspect_cache, sentiment_cache=sentiment_cache)
+        save_analysis(csv_path, frame, version)
+        print(f"{name}: {len(df)} reviews -> {len(frame)} rows in {time.perf_counter() - start:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("products", nargs="*", metavar="PRODUCT",
+                        help=f"products to precompute (default: all of {', '.join(DATABASE_FILES)})")
+    parser.add_argument("--force", action="store_true", help="recompute analyses that are up to date")
+    parser.add_argument("--n-process", type=int, default=1, help="spaCy processes")
+    args = parser.parse_args()
+    unknown = [name for name in args.products if name not in DATABASE_FILES]
+    if unknown:
+        parser.error(f"unknown products {unknown}, choose from {list(DATABASE_FILES)}")
+    precompute(args.products or None, args.force, args.n_process)
+
+
+if __name__ == "__main__":
+    main()
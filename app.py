@@ -1,44 +1,72 @@
+import time
+
+# Taken before the heavy imports so the reported startup time covers them
+APP_START = time.perf_counter()
+
 import pandas as pd
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 from streamlit_option_menu import option_menu
 from wordcloud import WordCloud
-import bs4
-from bs4 import BeautifulSoup
-import requests
-import re
-import nltk
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-import spacy
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-import datetime
-from dateutil.relativedelta import relativedelta
-import en_core_web_sm
-from aspect_extraction import apply_extraction
-from scrape import scrape_amazon_reviews, extract_asin_from_url
-from transformers import pipeline
-
-# Load pipeline
-pipe = pipeline("text-classification", model="nlptown/bert-base-multilingual-uncased-sentiment")
+import os
+from aspect_extraction import load_nlp, aspect_namespace, SPACY_MODEL, SPACY_KEEP_COMPONENTS
+from scrape import scrape_amazon_reviews
+from sentiment import load_sentiment_pipeline, sentiment_namespace
+from sentence_cache import SentenceCache, SENTENCE_CACHE_PATH
+from normalizer import downloads, build_lemmatizer, build_stopwords
+from review_pipeline import analyze_reviews
+from analysis_store import DATABASE_FILES, analysis_version, load_analysis
+from corpus_store import load_reviews
 
 st.set_page_config(page_title='Product Summarization', layout='wide')
 st.title('Product Review Summarisation')
 
-# Available CSV files for database option
-DATABASE_FILES = {
-    "iPhone 15": "iphone_15.csv",
-    "JBL Earbuds": "jbl_earbuds.csv", 
-    "MacBook": "macbook.csv",
-    "Motorola Moto G85": "motorola_moto_G85.csv"
-}
+startup_time = time.perf_counter() - APP_START
+print(f"First paint after {startup_time:.2f}s")
+st.caption(f"Loaded in {startup_time:.2f}s")
+
+# Number of sentences sent to the sentiment model in one call
+SENTIMENT_BATCH_SIZE = 32
+
+# spaCy nlp.pipe settings for aspect extraction, n_process > 1 parses on several cores
+SPACY_BATCH_SIZE = 1000
+SPACY_N_PROCESS = 1
+
+# spaCy components kept for aspect extraction (comma separated), the others (ner, lemmatizer) are excluded
+SPACY_COMPONENTS = os.environ.get("SPACY_COMPONENTS", ",".join(SPACY_KEEP_COMPONENTS)).split(",")
+
+@st.cache_resource
+def get_nlp():
+    """spaCy model for aspect extraction, loaded once per process"""
+    return load_nlp(SPACY_MODEL, keep=SPACY_COMPONENTS)
+
+@st.cache_resource
+def get_sentiment_pipeline():
+    """Sentiment model, loaded on first use and kept once per process"""
+    return load_sentiment_pipeline()
+
+@st.cache_resource
+def get_aspect_cache():
+    """Aspect pairs of the sentences already analyzed, in memory and in SENTENCE_CACHE_PATH"""
+    return SentenceCache(aspect_namespace(get_nlp()), SENTENCE_CACHE_PATH)
+
+@st.cache_resource
+def get_sentiment_cache():
+    """Sentiments of the sentences already analyzed, in memory and in SENTENCE_CACHE_PATH"""
+    return SentenceCache(sentiment_namespace(get_sentiment_pipeline()), SENTENCE_CACHE_PATH)
+
+@st.cache_resource
+def get_cleaning():
+    """Lemmatizer and stopword set for cleaning, built once per process"""
+    downloads()
+    return build_lemmatizer(), build_stopwords()
 
 def load_data_from_database(selected_product):
-    """Load data from selected CSV file"""
+    """Load the Date and Review columns of the selected CSV file from its Parquet corpus"""
     try:
         file_path = DATABASE_FILES[selected_product]
-        df_amazon = pd.read_csv(file_path)
+        df_amazon = load_reviews(file_path)
         df_amazon.dropna(inplace=True)
         return df_amazon
     except Exception as e:
@@ -60,164 +88,29 @@ def scrape_fresh_data(url, page_number, pages_to_extract):
         st.error(f"Error scraping data: {str(e)}")
         return None
 
+def load_precomputed_analysis(selected_product):
+    """Analysis of a database product saved by analysis_store.py, None when missing or stale"""
+    start = time.perf_counter()
+    final_df = load_analysis(DATABASE_FILES[selected_product], analysis_version(SPACY_COMPONENTS))
+    if final_df is not None:
+        print(f"Precomputed analysis of {selected_product} loaded in {(time.perf_counter() - start) * 1000:.0f}ms")
+    return final_df
+
 def process_reviews(df):
     """Main processing function for reviews"""
-    
-    def split_review(text):
-        """Split review into multiple sentences based on conjunctions"""
-        delimiters = ".", "but", "and", "also"
-        regex_pattern = '|'.join(map(re.escape, delimiters))
-        splitted = re.split(regex_pattern, text)
-        return splitted
-
-    @st.cache_data
-    def downloads():
-        nltk.download('stopwords')
-        nltk.download('wordnet')
-        nltk.download('omw-1.4')
 
-    downloads()
-    
     # Data Cleaning
-    lemma = WordNetLemmatizer()
-    all_stopwords = stopwords.words('english')
-    
-    # Remove important words from stopwords
-    important_words = ['not', 'but', 'because', 'against', 'between', 'up', 'down', 
-                      'in', 'out', 'once', 'before', 'after', 'few', 'more', 'most', 
-                      'no', 'nor', 'same', 'some']
-    
-    for word in important_words:
-        if word in all_stopwords:
-            all_stopwords.remove(word)
-
-    def clean_aspect_spacy(reviews):
-        """Clean and preprocess reviews"""
-        statement = reviews.lower().strip()
-        contractions = {
-            "won't": "will not", "cannot": "can not", "can't": "can not",
-            "n't": " not", "what's": "what is", "it's": "it is",
-            "'ve": " have", "i'm": "i am", "'re": " are",
-            "he's": "he is", "she's": "she is", "*****": " ",
-            "%": " percent ", "₹": " rupee ", "$": " dollar ",
-            "€": " euro ", "'ll": " will", "doesn't": "does not"
-        }
-        
-        for contraction, expansion in contractions.items():
-            statement = statement.replace(contraction, expansion)
-            
-        statement = re.sub('[^a-zA-Z]', ' ', statement)
-        statement = statement.split()
-        final_statement = [lemma.lemmatize(word) for word in statement if word not in set(all_stopwords)]
-        return ' '.join(final_statement)
-
-    def get_splitted_reviews(df):
-        """Split reviews and create new dataframe"""
-        reviews = []
-        dates = []
-        raw_reviews = []
-
-        for i, review in enumerate(df["Review"].values):
-            review_split = split_review(review)
-            review_split_ = [x for x in review_split if len(x.split()) >= 3]
-            duplicate_dates = [str(df["Date"].values[i]) for _ in range(len(review_split_))]
-            raws = [x for x in review_split if len(x.split()) >= 3]
-            
-            reviews.extend(review_split_)
-            dates.extend(duplicate_dates)
-            raw_reviews.extend(raws)
-
-        reviews_ = [clean_aspect_spacy(text) for text in reviews]
-        data = pd.DataFrame({"Date": dates, "Review": reviews_, "Raw_Review": raw_reviews})
-        return data
-
-    def extract_aspects(reviews, nlp):
-        """Extract aspects from reviews"""
-        aspect_list = reviews.apply(lambda row: apply_extraction(row, nlp), axis=1)
-        return list(aspect_list)
-
-    def add_data(data, aspect_list):
-        """Add aspects and descriptions to dataframe"""
-        rev_ = []
-        dates_ = []
-        aspects_ = []
-        description_ = []
-        raw_r = []
-
-        for i, j in enumerate(aspect_list):
-            if len(list(j.values())[0]) != 0:
-                length = len(list(j.values())[0])
-                rev_a = [data["Review"].values[i] for k in range(length)]
-                dates_a = [data["Date"].values[i] for k in range(length)]
-                raw_r_a = [data["Raw_Review"].values[i] for k in range(length)]
-                aspects_a = [list(j.values())[0][h]["noun"] for h in range(length)]
-                descrip_a = [list(j.values())[0][h]["adj"] for h in range(length)]
-
-                rev_.extend(rev_a)
-                dates_.extend(dates_a)
-                raw_r.extend(raw_r_a)
-                aspects_.extend(aspects_a)
-                description_.extend(descrip_a)
-            else:
-                rev_.append(data["Review"].values[i])
-                dates_.append(data["Date"].values[i])
-                raw_r.append(data["Raw_Review"].values[i])
-                aspects_.append('neutral')
-                description_.append('neutral')
-
-        return pd.DataFrame({
-            "Date": dates_, "Review": rev_, "Aspect": aspects_, 
-            "Description": description_, "Raw_Review": raw_r
-        })
-    
-    def star_to_sentiment(label):
-        if "1" in label or "2" in label:
-            return "Negative"
-        elif "3" in label:
-            return "Neutral"
-        else:
-            return "Positive"
-
-    def sentiment_scores(sentence):
-        """Calculate sentiment scores"""
-        prediction = pipe(sentence)[0]   # e.g. {'label': '1 star', 'score': 0.7}
-        sentiment = star_to_sentiment(prediction['label'])
-        stars = int(prediction['label'].split()[0])
-
-        return sentiment, stars
-
-
-    def create_final_dataframe(data):
-        """Create final dataframe with sentiments"""
-        sentiment_ = []
-        compound = []
-
-        for review in data["Review"].values:
-            sentiment, stars = sentiment_scores(review)
-            sentiment_.append(sentiment)
-            compound.append(stars)
-
-        data["Sentiment"] = sentiment_
-        data["Score"] = compound
-        data["Date"] = pd.to_datetime(data['Date'])
-        data.sort_values(by='Date', inplace=True)
-        data["Year"] = pd.DatetimeIndex(data['Date']).year
-        data["Month"] = pd.DatetimeIndex(data['Date']).month
-
-        return data.reset_index().drop(["index"], axis=1)
+    lemma, all_stopwords = get_cleaning()
 
     # Process the reviews
     with st.spinner("Processing reviews... This may take a few minutes."):
-        df1 = get_splitted_reviews(df)
-        
-        # Load spacy model
-        nlp = spacy.load("en_core_web_sm")
-        reviews_train = df1[["Review"]]
-        aspect_list_train = extract_aspects(reviews_train, nlp)
-        
-        df2 = add_data(df1, aspect_list_train)
-        final_df = create_final_dataframe(df2)
-        
+        final_df = analyze_reviews(
+            df, get_nlp(), get_sentiment_pipeline(), lemma, all_stopwords,
+            spacy_batch_size=SPACY_BATCH_SIZE, spacy_n_process=SPACY_N_PROCESS,
+            sentiment_batch_size=SENTIMENT_BATCH_SIZE,
+            aspect_cache=get_aspect_cache(), sentiment_cache=get_sentiment_cache(),
+        )
+
     return final_df
 
 def display_analysis(dfinal):
@@ -383,7 +276,11 @@ def main():
     if df_amazon is not None and not df_amazon.empty:
         if st.button("🔍 Analyze Reviews", type="primary"):
             try:
-                final_df = process_reviews(df_amazon)
+                final_df = None
+                if data_source == "Use Database (Existing Products)":
+                    final_df = load_precomputed_analysis(st.session_state.selected_product)
+                if final_df is None:
+                    final_df = process_reviews(df_amazon)
                 st.session_state.dfinal = final_df
                 st.success("✅ Analysis completed successfully!")
                 
@@ -1,3 +1,37 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+# Aspects referring to the product itself are reported as "product"
+PROD_PRONOUNS = frozenset(['it', 'this', 'they', 'these'])
+
+SPACY_MODEL = "en_core_web_sm"
+
+# The rules only read dep_ (parser), tag_ (tagger) and pos_ (attribute_ruler), both trained
+# components listen to tok2vec. is_stop is a lexical attribute and needs no component.
+SPACY_KEEP_COMPONENTS = ("tok2vec", "tagger", "parser", "attribute_ruler")
+
+# Part of the cache namespace of the extracted pairs, to be bumped whenever the rules change
+ASPECT_RULES_VERSION = 1
+
+
+def load_nlp(model=SPACY_MODEL, keep=SPACY_KEEP_COMPONENTS):
+        """
+        Loads the spaCy model with every pipeline component that is not in `keep` excluded,
+        so that e.g. ner and lemmatizer are neither loaded nor run
+
+        """
+        import spacy  # imported on first use, keeps the app's startup fast
+
+        model_path = spacy.util.get_package_path(model) if spacy.util.is_package(model) else Path(model)
+        meta = spacy.util.get_model_meta(model_path)
+        components = meta.get("components", meta.get("pipeline", []))
+        exclude = [name for name in components if name not in keep]
+        return spacy.load(model, exclude=exclude)
+
+
 def apply_extraction(row, nlp):
         """
         This function extracts aspect and its corresponding description from the review by
@@ -5,264 +39,319 @@ def apply_extraction(row, nlp):
 
         """
 
-        prod_pronouns = ['it', 'this', 'they', 'these']
-        review_body = row['Review']
-        doc = nlp(review_body)
+        return extract_from_doc(nlp(row['Review']))
+
+
+def bulk_extraction(reviews, nlp, batch_size=1000, n_process=1):
+        """
+        Streams all reviews through nlp.pipe and applies the 7 rules to every parsed Doc.
+        Returns one {"aspect_pairs": [...]} dict per review, in the order of the input.
+
+        """
+
+        return [extract_from_doc(doc) for doc in nlp.pipe(reviews, batch_size=batch_size, n_process=n_process)]
+
 
-        rule1_pairs = []
-        rule2_pairs = []
-        rule3_pairs = []
-        rule4_pairs = []
-        rule5_pairs = []
-        rule6_pairs = []
-        rule7_pairs = []
+class AspectPairBuffer:
+        """
+        Aspect pairs of many sentences in preallocated columnar buffers instead of one dict per
+        pair: an int32 sentence index, int32 codes of the noun and the adjective into a shared
+        table of distinct strings, and the uint8 rule id. The buffers double when full.
+        to_dicts() gives the {"aspect_pairs": [...]} dicts of bulk_extraction back.
+
+        """
+
+        def __init__(self, capacity=1024):
+                self.size = 0
+                self.sentence_index = np.empty(capacity, dtype=np.int32)
+                self.noun = np.empty(capacity, dtype=np.int32)
+                self.adj = np.empty(capacity, dtype=np.int32)
+                self.rule = np.empty(capacity, dtype=np.uint8)
+                self.strings = []
+                self._codes = {}
+
+        def _code(self, text):
+                code = self._codes.get(text)
+                if code is None:
+                        code = self._codes[text] = len(self.strings)
+                        self.strings.append(text)
+                return code
+
+        def _grow(self, min_capacity=0):
+                capacity = max(2 * len(self.rule), min_capacity)
+                for name in ("sentence_index", "noun", "adj", "rule"):
+                        old = getattr(self, name)
+                        new = np.empty(capacity, dtype=old.dtype)
+                        new[:self.size] = old[:self.size]
+                        setattr(self, name, new)
+
+        def append(self, sentence_index, noun, adj, rule):
+                if self.size == len(self.rule):
+                        self._grow()
+                i = self.size
+                self.sentence_index[i] = sentence_index
+                self.noun[i] = self._code(noun)
+                self.adj[i] = self._code(adj)
+                self.rule[i] = rule
+                self.size += 1
+
+        def add_doc(self, sentence_index, doc):
+                for A, M, rule in iter_aspect_pairs(doc):
+                        self.append(sentence_index, A, M, rule)
+
+        def sort(self):
+                """Orders the pairs by sentence index, the pairs of a sentence keep their order"""
+                order = np.argsort(self.sentence_index[:self.size], kind="stable")
+                for name in ("sentence_index", "noun", "adj", "rule"):
+                        column = getattr(self, name)
+                        column[:self.size] = column[:self.size][order]
+
+        def copy_pairs(self, targets, sources):
+                """
+                Appends the pairs of sentence sources[k] once more as pairs of sentence targets[k],
+                for every k, as codes without going through the strings. The buffer must be sorted.
+                """
+                index = self.sentence_index[:self.size]
+                begin = np.searchsorted(index, sources, side="left")
+                counts = np.searchsorted(index, sources, side="right") - begin
+                total = int(counts.sum())
+                if not total:
+                        return
+                # positions begin[k] .. begin[k] + counts[k] - 1 of every k, in one array
+                positions = np.repeat(begin - (np.cumsum(counts) - counts), counts) + np.arange(total)
+                if self.size + total > len(self.rule):
+                        self._grow(self.size + total)
+                end = self.size + total
+                self.sentence_index[self.size:end] = np.repeat(np.asarray(targets, dtype=np.int32), counts)
+                for name in ("noun", "adj", "rule"):
+                        column = getattr(self, name)
+                        column[self.size:end] = column[positions]
+                self.size = end
+
+        def __len__(self):
+                return self.size
+
+        @property
+        def nbytes(self):
+                """Bytes held by the buffers in use (not the string table)"""
+                return self.size * (4 + 4 + 4 + 1)
+
+        def to_columns(self):
+                """{"sentence_index", "noun", "adj", "rule"} columns, noun and adj as pandas Categoricals"""
+                categories = pd.Index(self.strings, dtype=object)
+                return {
+                        "sentence_index": self.sentence_index[:self.size],
+                        "noun": pd.Categorical.from_codes(self.noun[:self.size], categories=categories),
+                        "adj": pd.Categorical.from_codes(self.adj[:self.size], categories=categories),
+                        "rule": self.rule[:self.size],
+                }
+
+        def to_dicts(self, n_sentences):
+                """One {"aspect_pairs": [{"noun", "adj", "rule"}, ...]} dict per sentence, as bulk_extraction returns"""
+                result = [{"aspect_pairs": []} for _ in range(n_sentences)]
+                strings = self.strings
+                for i, noun, adj, rule in zip(self.sentence_index[:self.size].tolist(), self.noun[:self.size].tolist(),
+                                              self.adj[:self.size].tolist(), self.rule[:self.size].tolist()):
+                        result[i]["aspect_pairs"].append({"noun": strings[noun], "adj": strings[adj], "rule": rule})
+                return result
+
+
+def aspect_namespace(nlp):
+        """SentenceCache namespace of the pairs: spaCy model, its version and components, and the rules version"""
+        return (f"aspects:{nlp.meta['lang']}_{nlp.meta['name']}-{nlp.meta['version']}:"
+                f"{','.join(nlp.pipe_names)}:rules-{ASPECT_RULES_VERSION}")
+
+
+def bulk_extraction_buffer(reviews, nlp, batch_size=1000, n_process=1, capacity=1024, cache=None):
+        """
+        Writes the pairs of all reviews into one AspectPairBuffer, sentence_index being the
+        position of the review in the input. The pairs are in review order, and in rule order
+        within a review. Every distinct review is parsed once by nlp.pipe, and with a
+        SentenceCache (namespace from aspect_namespace) only the ones it does not hold.
+
+        The pairs go into the buffer as they are found: cached pairs are looked up and written
+        batch_size reviews at a time, the parsed Docs are streamed into it by add_doc, and the
+        pairs of repeated reviews are copied as codes. Only the pairs of the batch of Docs
+        being stored in the cache are held as Python lists.
+
+        """
+        if not hasattr(reviews, "__len__"):
+                reviews = list(reviews)
+        n = len(reviews)
+        buffer = AspectPairBuffer(capacity)
+        first = {}                                  # review -> position of its first occurrence
+        source = np.empty(n, dtype=np.int32)        # position of the first occurrence of every review
+        missed = np.zeros(n, dtype=bool)            # first occurrences that have to be parsed
+        hits = 0
+
+        for begin in range(0, n, batch_size):
+                new = []
+                for i in range(begin, min(begin + batch_size, n)):
+                        text = reviews[i]
+                        source[i] = first.setdefault(text, i)
+                        if source[i] == i:
+                                new.append(i)
+                cached = cache.get_many([reviews[i] for i in new]) if cache is not None else {}
+                hits += len(cached)
+                for i in new:
+                        pairs = cached.get(reviews[i])
+                        if pairs is None:
+                                missed[i] = True
+                                continue
+                        for A, M, rule in pairs:
+                                buffer.append(i, A, M, rule)
+
+        to_parse = np.flatnonzero(missed)
+        docs = nlp.pipe((reviews[i] for i in to_parse), batch_size=batch_size, n_process=n_process)
+        computed = {}
+        for i, doc in zip(to_parse.tolist(), docs):
+                if cache is None:
+                        buffer.add_doc(i, doc)
+                        continue
+                pairs = list(iter_aspect_pairs(doc))
+                for A, M, rule in pairs:
+                        buffer.append(i, A, M, rule)
+                computed[reviews[i]] = pairs
+                if len(computed) >= batch_size:
+                        cache.put_many(computed)
+                        computed = {}
+        if computed:
+                cache.put_many(computed)
+
+        buffer.sort()
+        repeats = np.flatnonzero(source != np.arange(n, dtype=np.int32))
+        if len(repeats):
+                buffer.copy_pairs(repeats, source[repeats])
+                buffer.sort()
+
+        if cache is not None:
+                rate = hits / len(first) if first else 0.0
+                print(f"Aspect cache: {n} sentences, {len(first)} distinct, "
+                      f"{hits} cached ({rate:.1%} hit rate), {len(to_parse)} computed")
+        return buffer
+
+
+def bulk_extraction_columns(reviews, nlp, batch_size=1000, n_process=1, cache=None):
+        """
+        The pairs of all reviews as flat columns instead of one dict per pair: {"sentence_index",
+        "noun", "adj", "rule"}, see bulk_extraction_buffer and AspectPairBuffer.to_columns
+
+        """
+
+        capacity = max(len(reviews), 1) if hasattr(reviews, "__len__") else 1024
+        return bulk_extraction_buffer(reviews, nlp, batch_size, n_process, capacity, cache).to_columns()
+
+
+def extract_from_doc(doc):
+        """
+        Applies the 7 rules of pos tagging to an already parsed Doc
+
+        """
+
+        aspects = [{"noun": A, "adj": M, "rule": rule} for A, M, rule in iter_aspect_pairs(doc)]
+        return {"aspect_pairs": aspects}
+
+
+def iter_aspect_pairs(doc):
+        """
+        Yields (aspect, description, rule) for every pair found in the Doc, all pairs of rule 1
+        first, then rule 2 and so on. The children of each token are visited once and every
+        dependency the rules 2-7 look at is collected in that single pass.
+
+        M - Sentiment modifier || A - Aspect
+
+        """
+
+        pairs = ([], [], [], [], [], [], [])
 
         for token in doc:
-            A = "999999"
-            M = "999999"
+            ## FIRST RULE OF DEPENDANCY PARSE -
+            ## Adjectival modifier - M is an amod of the noun A
             if token.dep_ == "amod" and not token.is_stop:
                 M = token.text
-                A = token.head.text
 
                 # add adverbial modifier of adjective (e.g. 'most comfortable headphones')
-                M_children = token.children
-                for child_m in M_children:
-                    if (child_m.dep_ == "advmod"):
-                        M_hash = child_m.text
-                        M = M_hash + " " + M
+                for child_m in token.children:
+                    if child_m.dep_ == "advmod":
+                        M = child_m.text + " " + M
                         break
 
                 # negation in adjective, the "no" keyword is a 'det' of the noun (e.g. no interesting characters)
-                A_children = token.head.children
-                for child_a in A_children:
-                    if (child_a.dep_ == "det" and child_a.text == 'no'):
-                        neg_prefix = 'not'
-                        M = neg_prefix + " " + M
+                for child_a in token.head.children:
+                    if child_a.dep_ == "det" and child_a.text == 'no':
+                        M = "not " + M
                         break
 
-            if (A != "999999" and M != "999999"):
-                if A in prod_pronouns:
-                    A = "product"
-                dict1 = {"noun": A, "adj": M, "rule": 1}
-                rule1_pairs.append(dict1)
-
-            # print("--- SPACY : Rule 1 Done ---")
-
-            # -----------------------------------------------------------------------------------------------------------------------------
-            # # SECOND RULE OF DEPENDANCY PARSE -
-            # # M - Sentiment modifier || A - Aspect
-            # Direct Object - A is a child of something with relationship of nsubj, while
-            # M is a child of the same something with relationship of dobj
-            # Assumption - A verb will have only one NSUBJ and DOBJ
-            children = token.children
-            A = "999999"
-            M = "999999"
-            add_neg_pfx = False
-            for child in children:
-                if (child.dep_ == "nsubj" and not child.is_stop):
-                    A = child.text
-                    # check_spelling(child.text)
-
-                if ((child.dep_ == "dobj" and child.pos_ == "ADJ") and not child.is_stop):
-                    M = child.text
-                    # check_spelling(child.text)
-
-                if (child.dep_ == "neg"):
-                    neg_prefix = child.text
-                    add_neg_pfx = True
-
-            if (add_neg_pfx and M != "999999"):
-                M = neg_prefix + " " + M
-
-            if (A != "999999" and M != "999999"):
-                if A in prod_pronouns:
-                    A = "product"
-                dict2 = {"noun": A, "adj": M, "rule": 2}
-                rule2_pairs.append(dict2)
-
-            # print("--- SPACY : Rule 2 Done ---")
-            # -----------------------------------------------------------------------------------------------------------------------------
-
-            ## THIRD RULE OF DEPENDANCY PARSE -
-            ## M - Sentiment modifier || A - Aspect
-            ## Adjectival Complement - A is a child of something with relationship of nsubj, while
-            ## M is a child of the same something with relationship of acomp
-            ## Assumption - A verb will have only one NSUBJ and DOBJ
-            ## "The sound of the speakers would be better. The sound of the speakers could be better" - handled using AUX dependency
-
-            children = token.children
-            A = "999999"
-            M = "999999"
-            add_neg_pfx = False
-            for child in children:
-                if (child.dep_ == "nsubj" and not child.is_stop):
-                    A = child.text
-                    # check_spelling(child.text)
-
-                if (child.dep_ == "acomp" and not child.is_stop):
-                    M = child.text
-
-                # example - 'this could have been better' -> (this, not better)
-                if (child.dep_ == "aux" and child.tag_ == "MD"):
-                    neg_prefix = "not"
-                    add_neg_pfx = True
-
-                if (child.dep_ == "neg"):
-                    neg_prefix = child.text
-                    add_neg_pfx = True
-
-            if (add_neg_pfx and M != "999999"):
-                M = neg_prefix + " " + M
-                # check_spelling(child.text)
-
-            if (A != "999999" and M != "999999"):
-                if A in prod_pronouns:
-                    A = "product"
-                dict3 = {"noun": A, "adj": M, "rule": 3}
-                rule3_pairs.append(dict3)
-                # rule3_pairs.append((A, M, sid.polarity_scores(M)['compound'],3))
-            # print("--- SPACY : Rule 3 Done ---")
-            # ------------------------------------------------------------------------------------------------------------------------------
-
-            ## FOURTH RULE OF DEPENDANCY PARSE -
-            ## M - Sentiment modifier || A - Aspect
-
-            # Adverbial modifier to a passive verb - A is a child of something with relationship of nsubjpass, while
-            # M is a child of the same something with relationship of advmod
-
-            # Assumption - A verb will have only one NSUBJ and DOBJ
-
-            children = token.children
-            A = "999999"
-            M = "999999"
-            add_neg_pfx = False
-            for child in children:
-                if ((child.dep_ == "nsubjpass" or child.dep_ == "nsubj") and not child.is_stop):
-                    A = child.text
-                    # check_spelling(child.text)
-
-                if (child.dep_ == "advmod" and not child.is_stop):
-                    M = child.text
-                    M_children = child.children
-                    for child_m in M_children:
-                        if (child_m.dep_ == "advmod"):
-                            M_hash = child_m.text
-                            M = M_hash + " " + child.text
+                pairs[0].append((token.head.text, M))
+
+            # Collect the children the remaining rules are built from. When a dependency occurs
+            # more than once the last child wins.
+            nsubj = None        # rules 2, 3, 5, 6, 7
+            subj = None         # rule 4, nsubj or nsubjpass
+            dobj = None
+            acomp = None
+            advmod = None
+            attr = None
+            cop = False
+            neg = None          # rules 2, 4, 7
+            neg_or_modal = None # rule 3, 'this could have been better' -> (this, not better)
+
+            for child in token.children:
+                dep = child.dep_
+                if dep == "neg":
+                    neg = neg_or_modal = child.text
+                elif dep == "aux":
+                    if child.tag_ == "MD":
+                        neg_or_modal = "not"
+                elif child.is_stop:
+                    continue
+                elif dep == "nsubj":
+                    nsubj = subj = child.text
+                elif dep == "nsubjpass":
+                    subj = child.text
+                elif dep == "dobj":
+                    if child.pos_ == "ADJ":
+                        dobj = child.text
+                elif dep == "acomp":
+                    acomp = child.text
+                elif dep == "advmod":
+                    advmod = child.text
+                    for child_m in child.children:
+                        if child_m.dep_ == "advmod":
+                            advmod = child_m.text + " " + child.text
                             break
-                    # check_spelling(child.text)
-
-                if (child.dep_ == "neg"):
-                    neg_prefix = child.text
-                    add_neg_pfx = True
-
-            if (add_neg_pfx and M != "999999"):
-                M = neg_prefix + " " + M
-
-            if (A != "999999" and M != "999999"):
-                if A in prod_pronouns:
-                    A = "product"
-                dict4 = {"noun": A, "adj": M, "rule": 4}
-                rule4_pairs.append(dict4)
-                # rule4_pairs.append((A, M,sid.polarity_scores(M)['compound'],4)) # )
-
-            # print("--- SPACY : Rule 4 Done ---")
-            # ------------------------------------------------------------------------------------------------------------------------------
-
-            ## FIFTH RULE OF DEPENDANCY PARSE -
-            ## M - Sentiment modifier || A - Aspect
-
-            # Complement of a copular verb - A is a child of M with relationship of nsubj, while
-            # M has a child with relationship of cop
-
-            # Assumption - A verb will have only one NSUBJ and DOBJ
-
-            children = token.children
-            A = "999999"
-            buf_var = "999999"
-            for child in children:
-                if (child.dep_ == "nsubj" and not child.is_stop):
-                    A = child.text
-                    # check_spelling(child.text)
-
-                if (child.dep_ == "cop" and not child.is_stop):
-                    buf_var = child.text
-                    # check_spelling(child.text)
-
-            if (A != "999999" and buf_var != "999999"):
-                if A in prod_pronouns:
-                    A = "product"
-                dict5 = {"noun": A, "adj": token.text, "rule": 5}
-                rule5_pairs.append(dict5)
-                # rule5_pairs.append((A, token.text,sid.polarity_scores(token.text)['compound'],5))
-
-            # print("--- SPACY : Rule 5 Done ---")
-            # ------------------------------------------------------------------------------------------------------------------------------
-
-            ## SIXTH RULE OF DEPENDANCY PARSE -
-            ## M - Sentiment modifier || A - Aspect
-            ## Example - "It ok", "ok" is INTJ (interjections like bravo, great etc)
-
-            children = token.children
-            A = "999999"
-            M = "999999"
-            if (token.pos_ == "INTJ" and not token.is_stop):
-                for child in children:
-                    if (child.dep_ == "nsubj" and not child.is_stop):
-                        A = child.text
-                        M = token.text
-                        # check_spelling(child.text)
-
-            if (A != "999999" and M != "999999"):
-                if A in prod_pronouns:
-                    A = "product"
-                dict6 = {"noun": A, "adj": M, "rule": 6}
-                rule6_pairs.append(dict6)
-
-                # rule6_pairs.append((A, M,sid.polarity_scores(M)['compound'],6))
-
-            # print("--- SPACY : Rule 6 Done ---")
-
-            # ------------------------------------------------------------------------------------------------------------------------------
-
-            ## SEVENTH RULE OF DEPENDANCY PARSE -
-            ## M - Sentiment modifier || A - Aspect
-            ## ATTR - link between a verb like 'be/seem/appear' and its complement
-            ## Example: 'this is garbage' -> (this, garbage)
-
-            children = token.children
-            A = "999999"
-            M = "999999"
-            add_neg_pfx = False
-            for child in children:
-                if (child.dep_ == "nsubj" and not child.is_stop):
-                    A = child.text
-                    # check_spelling(child.text)
-
-                if ((child.dep_ == "attr") and not child.is_stop):
-                    M = child.text
-                    # check_spelling(child.text)
-
-                if (child.dep_ == "neg"):
-                    neg_prefix = child.text
-                    add_neg_pfx = True
-
-            if (add_neg_pfx and M != "999999"):
-                M = neg_prefix + " " + M
-
-            if (A != "999999" and M != "999999"):
-                if A in prod_pronouns:
-                    A = "product"
-                dict7 = {"noun": A, "adj": M, "rule": 7}
-                rule7_pairs.append(dict7)
-                # rule7_pairs.append((A, M,sid.polarity_scores(M)['compound'],7))
-
-        # print("--- SPACY : All Rules Done ---")
-
-        # ------------------------------------------------------------------------------------------------------------------------------
-
-        aspects = []
-
-        aspects = rule1_pairs + rule2_pairs + rule3_pairs + rule4_pairs + rule5_pairs + rule6_pairs + rule7_pairs
-
-        dic = {"aspect_pairs": aspects}
-        return dic
\ No newline at end of file
+                elif dep == "attr":
+                    attr = child.text
+                elif dep == "cop":
+                    cop = True
+
+            if nsubj is not None:
+                ## SECOND RULE - Direct Object, A is nsubj and M is an adjective dobj of the same token
+                if dobj is not None:
+                    pairs[1].append((nsubj, dobj if neg is None else neg + " " + dobj))
+
+                ## THIRD RULE - Adjectival Complement, A is nsubj and M is acomp of the same token
+                if acomp is not None:
+                    pairs[2].append((nsubj, acomp if neg_or_modal is None else neg_or_modal + " " + acomp))
+
+            ## FOURTH RULE - Adverbial modifier to a passive verb, A is nsubjpass/nsubj and M is advmod
+            if subj is not None and advmod is not None:
+                pairs[3].append((subj, advmod if neg is None else neg + " " + advmod))
+
+            if nsubj is not None:
+                ## FIFTH RULE - Complement of a copular verb, A is nsubj of M and M has a cop child
+                if cop:
+                    pairs[4].append((nsubj, token.text))
+
+                ## SIXTH RULE - Example - "It ok", "ok" is INTJ (interjections like bravo, great etc)
+                if token.pos_ == "INTJ" and not token.is_stop:
+                    pairs[5].append((nsubj, token.text))
+
+                ## SEVENTH RULE - ATTR, link between a verb like 'be/seem/appear' and its complement
+                ## Example: 'this is garbage' -> (this, garbage)
+                if attr is not None:
+                    pairs[6].append((nsubj, attr if neg is None else neg + " " + attr))
+
+        for rule, rule_pairs in enumerate(pairs, start=1):
+            for A, M in rule_pairs:
+                yield ("product" if A in PROD_PRONOUNS else A), M, rule
@@ -0,0 +1,143 @@
+import asyncio
+import time
+from urllib.parse import urlparse
+
+import aiohttp
+
+from fetcher import TIMEOUT, MAX_RETRIES, RETRY_STATUSES, AdaptiveRateLimiter, RequestPolicy
+from sites import AMAZON, site_for_url
+
+# Pages fetched at the same time over all products
+CONCURRENCY = 32
+
+# Pages fetched at the same time from any one domain
+PER_DOMAIN_CONCURRENCY = 8
+
+# Requests per second sent to any one domain
+PER_DOMAIN_REQUESTS_PER_SECOND = 5.0
+
+
+class DomainPoliteness:
+    """
+    Per domain limits of the async engine: at most `concurrency` requests in flight to a
+    domain, spaced by the same AdaptiveRateLimiter the threaded fetcher uses, starting at
+    requests_per_second (no spacing when it is falsy)
+
+    """
+
+    def __init__(self, concurrency=PER_DOMAIN_CONCURRENCY, requests_per_second=PER_DOMAIN_REQUESTS_PER_SECOND,
+                 rate_limiter=None):
+        self.concurrency = concurrency
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter(requests_per_second)
+        self._semaphores = {}
+
+    def semaphore(self, url):
+        domain = urlparse(url).netloc
+        if domain not in self._semaphores:
+            self._semaphores[domain] = asyncio.Semaphore(self.concurrency)
+        return self._semaphores[domain]
+
+    async def wait(self, url):
+        """Sleeps until a request to the domain of url may be sent"""
+        delay = self.rate_limiter.reserve(url)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def iter_product_pages(products, concurrency=CONCURRENCY, politeness=None, headers=None,
+                             max_retries=MAX_RETRIES, policy=None):
+    """
+    Fetches the review pages of all products on one event loop and yields
+    (product_url, page_number, rows) for every page as soon as it has been parsed, in the
+    order the pages complete. rows are the tuples parsed from the page by the SiteAdapter of
+    the product's host (Amazon for unknown hosts), so one run may mix products of several sites.
+    Requests have the TIMEOUT of the threaded fetcher and follow the same RequestPolicy:
+    retries with backoff, adaptive rates per domain and a latency histogram, printed at the end.
+
+    Args:
+        products (list): (url, page_number, pages_to_extract) of every product, the url ends
+            with its page number like the ones scrape_reviews takes
+        concurrency (int): Pages fetched at the same time over all products
+        politeness (DomainPoliteness): Per domain limits (default: DomainPoliteness())
+        policy (RequestPolicy): Retry rules and statistics (default: one over the rate
+            limiter of politeness)
+    """
+    politeness = politeness or DomainPoliteness()
+    policy = policy or RequestPolicy(max_retries=max_retries, rate_limiter=politeness.rate_limiter)
+    global_semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(sock_connect=TIMEOUT[0], sock_read=TIMEOUT[1])
+
+    async with aiohttp.ClientSession(connector=connector, headers=headers, timeout=timeout) as session:
+
+        async def get(url, site_headers):
+            attempt = 0
+            while True:
+                async with global_semaphore, politeness.semaphore(url):
+                    await politeness.wait(url)
+                    start = time.perf_counter()
+                    try:
+                        async with session.get(url, headers=site_headers) as response:
+                            ok = response.status not in RETRY_STATUSES
+                            if ok:
+                                content = await response.read()
+                            policy.record(url, time.perf_counter() - start, ok)
+                            if ok:
+                                return content
+                            delay = policy.retry_delay(attempt, response.headers.get("Retry-After"))
+                            if delay is None:
+                                response.raise_for_status()
+                    except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                        policy.record(url, time.perf_counter() - start, False)
+                        delay = policy.retry_delay(attempt)
+                        if delay is None:
+                            raise
+                # the slot is given back while waiting for the retry
+                await asyncio.sleep(delay)
+                attempt += 1
+
+        async def fetch(site, product_url, page, url):
+            return product_url, page, site.parse(await get(url, site.headers))
+
+        tasks = [
+            asyncio.ensure_future(fetch(site, url, page, page_url))
+            for url, page_number, pages_to_extract in products
+            for site in [site_for_url(url, default=AMAZON)]
+            for page, page_url in site.page_urls(url, page_number, pages_to_extract)
+        ]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+            if policy.latency.count:
+                print(policy.summary())
+
+
+async def scrape_products_async(products, concurrency=CONCURRENCY, politeness=None, headers=None,
+                                max_retries=MAX_RETRIES):
+    """
+    Scrapes the reviews of all products, see iter_product_pages for the arguments. Returns
+    {product_url: dataframe of the site's columns} with each product's reviews in page order.
+
+    """
+    pages = {url: {} for url, _, _ in products}
+    start = time.perf_counter()
+    async for product_url, page, rows in iter_product_pages(products, concurrency, politeness, headers, max_retries):
+        pages[product_url][page] = rows
+    elapsed = time.perf_counter() - start
+
+    n_pages = sum(len(product_pages) for product_pages in pages.values())
+    print(f"Fetched {n_pages} pages of {len(products)} products in {elapsed:.2f}s "
+          f"({n_pages / elapsed if elapsed > 0 else 0.0:.1f} pages/sec)")
+    return {
+        url: site_for_url(url, default=AMAZON).frame(
+            [row for page in sorted(product_pages) for row in product_pages[page]])
+        for url, product_pages in pages.items()
+    }
+
+
+def scrape_products(products, concurrency=CONCURRENCY, politeness=None, headers=None, max_retries=MAX_RETRIES):
+    """Blocking version of scrape_products_async"""
+    return asyncio.run(scrape_products_async(products, concurrency, politeness, headers, max_retries))
@@ -0,0 +1,824 @@
+"""
+Micro-benchmarks for the review pipeline, run against the bundled CSVs
+
+    python benchmark.py rules
+    python benchmark.py normalize
+    python benchmark.py scrape
+    python benchmark.py fetch
+    python benchmark.py parse
+    python benchmark.py split
+    python benchmark.py aspects
+    python benchmark.py pairs
+    python benchmark.py corpus
+
+
+"""
+import argparse
+import glob
+import html
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+# Amazon review page saved for the stub server of the fetch benchmark, ten reviews
+SAVED_AMAZON_PAGE = os.path.join("fixtures", "amazon_review_page.html")
+
+# What Amazon answers with status 200 instead of the reviews when it suspects a bot
+ROBOT_CHECK_PAGE = b"<html><head><title>Robot Check</title></head><body>Type the characters you see</body></html>"
+
+
+def load_reviews(clean=True):
+    """Reviews of the bundled clean_*.csv files, or of the raw CSVs they were cleaned from"""
+    paths = glob.glob("clean_*.csv") if clean else [p for p in glob.glob("*.csv") if not p.startswith("clean_")]
+    reviews = []
+    for path in sorted(paths):
+        reviews.extend(pd.read_csv(path)["Review"].dropna().astype(str).tolist())
+    return reviews
+
+
+# Navigation markup around the reviews, so mock pages have roughly the tag count of real ones
+PAGE_FILLER = "<div id='nav'><ul>" + "".join(
+    f"<li class='nav-item'><a href='/c/{i}'><span>Category {i}</span></a></li>" for i in range(400)
+) + "</ul></div>"
+
+
+def mock_amazon_page(reviews, dates, page):
+    """Amazon review page with ten of the given reviews, in the markup parse_amazon_page reads"""
+    parts = ['<html><body>', PAGE_FILLER]
+    # the two dates of the top reviews that parse_amazon_page skips
+    parts += ['<span class="a-size-base a-color-secondary review-date">Reviewed on 1 January 2025</span>'] * 2
+    for i in range(10):
+        n = (page * 10 + i) % len(reviews)
+        parts.append(
+            '<div class="a-section review aok-relative">'
+            f'<a class="a-size-base a-link-normal review-title a-color-base review-title-content a-text-bold">Review {n}</a>'
+            f'<span class="a-size-base a-color-secondary review-date">Reviewed in India on {html.escape(dates[n])}</span>'
+            '<div class="a-row a-spacing-small review-data">'
+            f'<span class="a-size-base review-text review-text-content">{html.escape(reviews[n])}</span>'
+            '</div></div>'
+        )
+    parts.append('</body></html>')
+    return ''.join(parts).encode('utf-8')
+
+
+def mock_flipkart_page(reviews, dates, page):
+    """Flipkart review page with ten of the given reviews, in the markup of the flipkart parsers"""
+    parts = ['<html><body>', PAGE_FILLER]
+    for i in range(10):
+        n = (page * 10 + i) % len(reviews)
+        parts.append(
+            '<div class="col EPCmJX"><div class="row">'
+            f'<div class="ZmyHeo"><div><div class="">{html.escape(reviews[n])}</div>'
+            '<span class="wTYmpv"><span>READ MORE</span></span></div></div>'
+            f'</div><div class="row"><p class="_2NsDsF AwS1CA">Reviewer {n}</p>'
+            f'<p class="_2NsDsF">{n % 11 + 1} months ago</p></div></div>'
+        )
+    parts.append('</body></html>')
+    return ''.join(parts).encode('utf-8')
+
+
+def load_raw_reviews():
+    """Reviews and dates of the bundled raw CSVs"""
+    frames = [pd.read_csv(p).dropna() for p in sorted(glob.glob("*.csv")) if not p.startswith("clean_")]
+    df = pd.concat(frames)
+    return df["Review"].astype(str).tolist(), df["Date"].astype(str).tolist()
+
+
+def serve_mock_reviews(latency):
+    """
+    Starts a local HTTP server in a background thread that answers /<product>/...<page number>
+    with a mock Amazon review page built from the bundled raw CSVs after `latency` seconds
+
+    """
+    reviews, dates = load_raw_reviews()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency)
+            body = mock_amazon_page(reviews, dates, int(re.search(r"(\d+)$", self.path).group(1)))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 256
+
+    server = Server(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def serve_saved_page(path, latency):
+    """
+    Starts a local HTTP server in a background thread that answers /<product>/...<page number>
+    with the saved review page at path after `latency` seconds, every review text prefixed
+    with "[page N]" so the order of the scraped pages can be checked. The server records the
+    arrival time of every request, the requests per page and the most requests it was
+    answering at once. The first request for a page in server.robot_pages is answered with
+    ROBOT_CHECK_PAGE, for one in server.fail_pages with a 500.
+
+    """
+    with open(path, "rb") as f:
+        saved = f.read()
+    marker = b'review-text-content">'
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            page = int(re.search(r"(\d+)$", self.path).group(1))
+            with lock:
+                server.arrivals.append(time.monotonic())
+                server.requests[page] += 1
+                first = server.requests[page] == 1
+                server.in_flight += 1
+                server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            try:
+                time.sleep(latency)
+                status = 500 if first and page in server.fail_pages else 200
+                if first and page in server.robot_pages:
+                    body = ROBOT_CHECK_PAGE
+                else:
+                    body = saved.replace(marker, marker + f"[page {page}] ".encode())
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            finally:
+                with lock:
+                    server.in_flight -= 1
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 256
+
+        def reset(self):
+            self.arrivals, self.in_flight, self.max_in_flight = [], 0, 0
+            self.requests, self.robot_pages, self.fail_pages = Counter(), set(), set()
+
+    server = Server(("127.0.0.1", 0), Handler)
+    server.reset()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def best_time(func, repeat):
+    """Best wall time of `repeat` runs of func, and the result of the last run"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def legacy_extract_from_doc(doc):
+    """The 7 rules as they were before the single-pass rewrite, kept as the reference"""
+    prod_pronouns = ['it', 'this', 'they', 'these']
+
+    rule1_pairs = []
+    rule2_pairs = []
+    rule3_pairs = []
+    rule4_pairs = []
+    rule5_pairs = []
+    rule6_pairs = []
+    rule7_pairs = []
+
+    for token in doc:
+        A = "999999"
+        M = "999999"
+        if token.dep_ == "amod" and not token.is_stop:
+            M = token.text
+            A = token.head.text
+
+            M_children = token.children
+            for child_m in M_children:
+                if (child_m.dep_ == "advmod"):
+                    M_hash = child_m.text
+                    M = M_hash + " " + M
+                    break
+
+            A_children = token.head.children
+            for child_a in A_children:
+                if (child_a.dep_ == "det" and child_a.text == 'no'):
+                    neg_prefix = 'not'
+                    M = neg_prefix + " " + M
+                    break
+
+        if (A != "999999" and M != "999999"):
+            if A in prod_pronouns:
+                A = "product"
+            dict1 = {"noun": A, "adj": M, "rule": 1}
+            rule1_pairs.append(dict1)
+
+        children = token.children
+        A = "999999"
+        M = "999999"
+        add_neg_pfx = False
+        for child in children:
+            if (child.dep_ == "nsubj" and not child.is_stop):
+                A = child.text
+
+            if ((child.dep_ == "dobj" and child.pos_ == "ADJ") and not child.is_stop):
+                M = child.text
+
+            if (child.dep_ == "neg"):
+                neg_prefix = child.text
+                add_neg_pfx = True
+
+        if (add_neg_pfx and M != "999999"):
+            M = neg_prefix + " " + M
+
+        if (A != "999999" and M != "999999"):
+            if A in prod_pronouns:
+                A = "product"
+            dict2 = {"noun": A, "adj": M, "rule": 2}
+            rule2_pairs.append(dict2)
+
+        children = token.children
+        A = "999999"
+        M = "999999"
+        add_neg_pfx = False
+        for child in children:
+            if (child.dep_ == "nsubj" and not child.is_stop):
+                A = child.text
+
+            if (child.dep_ == "acomp" and not child.is_stop):
+                M = child.text
+
+            if (child.dep_ == "aux" and child.tag_ == "MD"):
+                neg_prefix = "not"
+                add_neg_pfx = True
+
+            if (child.dep_ == "neg"):
+                neg_prefix = child.text
+                add_neg_pfx = True
+
+        if (add_neg_pfx and M != "999999"):
+            M = neg_prefix + " " + M
+
+        if (A != "999999" and M != "999999"):
+            if A in prod_pronouns:
+                A = "product"
+            dict3 = {"noun": A, "adj": M, "rule": 3}
+            rule3_pairs.append(dict3)
+
+        children = token.children
+        A = "999999"
+        M = "999999"
+        add_neg_pfx = False
+        for child in children:
+            if ((child.dep_ == "nsubjpass" or child.dep_ == "nsubj") and not child.is_stop):
+                A = child.text
+
+            if (child.dep_ == "advmod" and not child.is_stop):
+                M = child.text
+                M_children = child.children
+                for child_m in M_children:
+                    if (child_m.dep_ == "advmod"):
+                        M_hash = child_m.text
+                        M = M_hash + " " + child.text
+                        break
+
+            if (child.dep_ == "neg"):
+                neg_prefix = child.text
+                add_neg_pfx = True
+
+        if (add_neg_pfx and M != "999999"):
+            M = neg_prefix + " " + M
+
+        if (A != "999999" and M != "999999"):
+            if A in prod_pronouns:
+                A = "product"
+            dict4 = {"noun": A, "adj": M, "rule": 4}
+            rule4_pairs.append(dict4)
+
+        children = token.children
+        A = "999999"
+        buf_var = "999999"
+        for child in children:
+            if (child.dep_ == "nsubj" and not child.is_stop):
+                A = child.text
+
+            if (child.dep_ == "cop" and not child.is_stop):
+                buf_var = child.text
+
+        if (A != "999999" and buf_var != "999999"):
+            if A in prod_pronouns:
+                A = "product"
+            dict5 = {"noun": A, "adj": token.text, "rule": 5}
+            rule5_pairs.append(dict5)
+
+        children = token.children
+        A = "999999"
+        M = "999999"
+        if (token.pos_ == "INTJ" and not token.is_stop):
+            for child in children:
+                if (child.dep_ == "nsubj" and not child.is_stop):
+                    A = child.text
+                    M = token.text
+
+        if (A != "999999" and M != "999999"):
+            if A in prod_pronouns:
+                A = "product"
+            dict6 = {"noun": A, "adj": M, "rule": 6}
+            rule6_pairs.append(dict6)
+
+        children = token.children
+        A = "999999"
+        M = "999999"
+        add_neg_pfx = False
+        for child in children:
+            if (child.dep_ == "nsubj" and not child.is_stop):
+                A = child.text
+
+            if ((child.dep_ == "attr") and not child.is_stop):
+                M = child.text
+
+            if (child.dep_ == "neg"):
+                neg_prefix = child.text
+                add_neg_pfx = True
+
+        if (add_neg_pfx and M != "999999"):
+            M = neg_prefix + " " + M
+
+        if (A != "999999" and M != "999999"):
+            if A in prod_pronouns:
+                A = "product"
+            dict7 = {"noun": A, "adj": M, "rule": 7}
+            rule7_pairs.append(dict7)
+
+    aspects = []
+
+    aspects = rule1_pairs + rule2_pairs + rule3_pairs + rule4_pairs + rule5_pairs + rule6_pairs + rule7_pairs
+
+    dic = {"aspect_pairs": aspects}
+    return dic
+
+
+def bench_rules(args):
+    """Tokens/sec of the 7 dependency rules, before and after the single-pass rewrite"""
+    from aspect_extraction import extract_from_doc, load_nlp
+
+    nlp = load_nlp()
+    docs = list(nlp.pipe(load_reviews()))
+    n_tokens = sum(len(doc) for doc in docs)
+    print(f"{len(docs)} reviews, {n_tokens} tokens, best of {args.repeat} runs")
+
+    results = {}
+    for name, rules in [("before", legacy_extract_from_doc), ("after", extract_from_doc)]:
+        elapsed, results[name] = best_time(lambda: [rules(doc) for doc in docs], args.repeat)
+        print(f"  {name:<8}{elapsed:8.3f}s  {n_tokens / elapsed:12.0f} tokens/sec")
+
+    assert results["before"] == results["after"], "rule outputs differ"
+    print("  outputs identical")
+
+
+def legacy_clean_review(reviews, lemma, all_stopwords):
+    """clean.clean_aspect_spacy before the shared normalizer, kept as the reference"""
+    statement = reviews.lower().strip()
+    statement = statement.replace("won't", "will not").replace("cannot", "can not").replace("can't", "can not") \
+        .replace("n't", " not").replace("what's", "what is").replace("it's", "it is") \
+        .replace("'ve", " have").replace("i'm", "i am").replace("'re", " are") \
+        .replace("he's", "he is").replace("she's", "she is").replace("*****", " ") \
+        .replace("%", " percent ").replace("₹", " rupee ").replace("$", " dollar ") \
+        .replace("€", " euro ").replace("'ll", " will").replace("doesn't", "does not")
+    statement = re.sub('[^a-zA-Z]', ' ', statement)
+    statement = statement.split()
+    final_statement = [lemma.lemmatize(word) for word in statement if not word in set(all_stopwords)]
+    return ' '.join(final_statement)
+
+
+def bench_normalize(args):
+    """Reviews/sec of the review cleaner over the raw CSVs, before and after the shared normalizer"""
+    from nltk.corpus import stopwords
+    from nltk.stem import WordNetLemmatizer
+    from normalizer import downloads, build_lemmatizer, build_stopwords, normalize_review, STOPWORDS_TO_KEEP
+
+    downloads()
+    reviews = load_reviews(clean=False)
+    print(f"{len(reviews)} reviews, best of {args.repeat} runs")
+
+    # what setup_cleaning returned before: a plain lemmatizer and a stopword list
+    lemma = WordNetLemmatizer()
+    all_stopwords = [word for word in stopwords.words('english') if word not in STOPWORDS_TO_KEEP]
+    elapsed, before = best_time(lambda: [legacy_clean_review(r, lemma, all_stopwords) for r in reviews], args.repeat)
+    print(f"  {'before':<8}{elapsed:8.3f}s  {len(reviews) / elapsed:12.0f} reviews/sec")
+
+    # a fresh cache every run, so the lemma memo is not warmed up by earlier runs
+    def normalize_all():
+        lemmatize = build_lemmatizer().lemmatize
+        stopword_set = build_stopwords()
+        return [normalize_review(r, lemmatize, stopword_set) for r in reviews]
+
+    elapsed, after = best_time(normalize_all, args.repeat)
+    print(f"  {'after':<8}{elapsed:8.3f}s  {len(reviews) / elapsed:12.0f} reviews/sec")
+
+    assert before == after, "normalized reviews differ"
+    print("  outputs identical")
+
+
+def bench_scrape(args):
+    """Pages/sec of the scrapers against a local mock server"""
+    import requests
+    from async_scrape import scrape_products, DomainPoliteness
+    from fetcher import PageFetcher
+    from scrape import scrape_amazon_reviews, amazon_page_urls, parse_amazon_page
+
+    server = serve_mock_reviews(args.latency)
+    base = f"http://127.0.0.1:{server.server_port}"
+    products = [(f"{base}/product-reviews/P{i:09d}/ref?pageNumber=1", 1, args.pages) for i in range(args.products)]
+    n_pages = args.products * args.pages
+    print(f"{args.products} products x {args.pages} pages, {args.latency * 1000:.0f} ms server latency")
+
+    def report(name, elapsed, n_reviews):
+        print(f"  {name:<12}{elapsed:8.2f}s  {n_pages / elapsed:8.1f} pages/sec  {n_reviews} reviews")
+
+    if not args.skip_sequential:
+        # one page after the other without keep-alive, as the recursive scraper did
+        start = time.perf_counter()
+        n_reviews = sum(len(parse_amazon_page(requests.get(url).content))
+                        for url, first, last in products for url in amazon_page_urls(url, first, last))
+        report("sequential", time.perf_counter() - start, n_reviews)
+
+    start = time.perf_counter()
+    with PageFetcher(max_workers=args.concurrency, requests_per_second=None) as fetcher:
+        n_reviews = sum(len(scrape_amazon_reviews(*product, fetcher=fetcher)) for product in products)
+    report("threaded", time.perf_counter() - start, n_reviews)
+
+    # fetch threads and parse processes overlapped, see scrape_pipeline
+    start = time.perf_counter()
+    with PageFetcher(max_workers=args.concurrency, requests_per_second=None) as fetcher:
+        n_reviews = sum(len(scrape_amazon_reviews(*product, fetcher=fetcher, parse_workers=args.parse_workers))
+                        for product in products)
+    report("pipelined", time.perf_counter() - start, n_reviews)
+
+    start = time.perf_counter()
+    politeness = DomainPoliteness(concurrency=args.concurrency, requests_per_second=None)
+    frames = scrape_products(products, concurrency=args.concurrency, politeness=politeness)
+    report("asyncio", time.perf_counter() - start, sum(len(df) for df in frames.values()))
+    server.shutdown()
+
+
+def bench_fetch(args):
+    """
+    PageFetcher against a stub server serving the saved review page: checks that the reviews
+    come out in page order, that no more than max_workers requests are in flight at once,
+    that the requests to the host stay within requests_per_second and that a resumed scrape
+    requests a page that came back without reviews again instead of reading it from the cache
+    """
+    import tempfile
+    import requests
+    from fetcher import PageFetcher
+    from http_cache import ResponseCache
+    from scrape import scrape_amazon_reviews, parse_amazon_page
+    from sites import AMAZON
+
+    with open(args.page, "rb") as f:
+        per_page = len(parse_amazon_page(f.read()))
+    server = serve_saved_page(args.page, args.latency)
+    url = f"http://127.0.0.1:{server.server_port}/product-reviews/B0STUBPAGE/ref?pageNumber=1"
+    expected_pages = [page for page in range(1, args.pages + 1) for _ in range(per_page)]
+    print(f"{args.pages} pages of {args.page}, {args.latency * 1000:.0f} ms server latency")
+
+    def run(name, max_workers, requests_per_second):
+        server.reset()
+        start = time.perf_counter()
+        with PageFetcher(max_workers=max_workers, requests_per_second=requests_per_second) as fetcher:
+            df = scrape_amazon_reviews(url, 1, args.pages, fetcher=fetcher)
+        elapsed = time.perf_counter() - start
+
+        pages = df["Review"].str.extract(r"^\[page (\d+)\]", expand=False).astype(int).tolist()
+        assert pages == expected_pages, f"{name}: reviews out of page order"
+        assert server.max_in_flight <= max_workers, \
+            f"{name}: {server.max_in_flight} requests in flight, max_workers is {max_workers}"
+        limit = f"{requests_per_second:g} req/s" if requests_per_second else "no rate limit"
+        if requests_per_second:
+            # at most one request more than the rate in any second, the first one starts the window
+            arrivals = server.arrivals
+            busiest = max(sum(1 for t in arrivals[i:] if t - arrivals[i] < 1.0) for i in range(len(arrivals)))
+            assert busiest <= requests_per_second + 1, f"{name}: {busiest} requests within one second"
+        print(f"  {name:<12}{elapsed:8.2f}s  {args.pages / elapsed:8.1f} pages/sec  "
+              f"{server.max_in_flight}/{max_workers} in flight, {limit}")
+
+    run("concurrency", args.concurrency, None)
+    run("rate limit", args.concurrency, args.rate)
+    print(f"  {len(expected_pages)} reviews in page order, concurrency and rate limits held")
+
+    # page 2 is a robot check and page 3 fails on the first run, the resumed run must request both again
+    server.reset()
+    server.robot_pages, server.fail_pages = {2}, {3}
+    resume_url = url.replace("B0STUBPAGE", f"B0RESUME{server.server_port}")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        try:
+            with PageFetcher(max_workers=1, requests_per_second=None, cache=ResponseCache(cache_dir),
+                             max_retries=0) as fetcher:
+                scrape_amazon_reviews(resume_url, 1, 4, fetcher=fetcher, resume=True)
+        except requests.HTTPError:
+            pass
+        else:
+            raise AssertionError("resume: the failing page did not stop the first run")
+        # as a cache written before empty pages were evicted holds it, resume must not trust it
+        [(_, robot_url)] = AMAZON.page_urls(resume_url, 2, 2)
+        ResponseCache(cache_dir).put(robot_url, ROBOT_CHECK_PAGE)
+        with PageFetcher(max_workers=1, requests_per_second=None, cache=ResponseCache(cache_dir)) as fetcher:
+            df = scrape_amazon_reviews(resume_url, 1, 4, fetcher=fetcher, resume=True)
+    pages = df["Review"].str.extract(r"^\[page (\d+)\]", expand=False).astype(int).tolist()
+    assert pages == [page for page in range(1, 5) for _ in range(per_page)], "resume: reviews missing"
+    assert dict(server.requests) == {1: 1, 2: 2, 3: 2, 4: 1}, f"resume: requests per page {dict(server.requests)}"
+    print("  resumed scrape requested the robot-checked and the failed page again, checkpointed page not")
+    server.shutdown()
+
+
+def bench_parse(args):
+    """Pages/sec of the BeautifulSoup and lxml parser backends on saved or mock review pages"""
+    from review_parsers import PARSERS
+
+    if args.html_dir:
+        pages = {args.site: [open(p, "rb").read() for p in sorted(glob.glob(f"{args.html_dir}/*.html"))]}
+    else:
+        reviews, dates = load_raw_reviews()
+        pages = {
+            "amazon": [mock_amazon_page(reviews, dates, page) for page in range(args.pages)],
+            "flipkart": [mock_flipkart_page(reviews, dates, page) for page in range(args.pages)],
+        }
+
+    for site, site_pages in pages.items():
+        print(f"{site}: {len(site_pages)} pages, best of {args.repeat} runs")
+        results = {}
+        timings = {}
+        for backend, parse in PARSERS[site].items():
+            timings[backend], results[backend] = best_time(lambda: [parse(page) for page in site_pages], args.repeat)
+            n_rows = sum(len(rows) for rows in results[backend])
+            print(f"  {backend:<8}{timings[backend]:8.3f}s  {len(site_pages) / timings[backend]:10.1f} pages/sec  {n_rows} reviews")
+        assert results["bs4"] == results["lxml"], f"{site} backends parse different rows"
+        print(f"  outputs identical, lxml {timings['bs4'] / timings['lxml']:.1f}x faster")
+
+
+def legacy_split_reviews(df):
+    """Sentence split of app.get_splitted_reviews before review_pipeline, without the normalization"""
+    def split_review(text):
+        delimiters = ".", "but", "and", "also"
+        regex_pattern = '|'.join(map(re.escape, delimiters))
+        return re.split(regex_pattern, text)
+
+    dates = []
+    raw_reviews = []
+    for i, review in enumerate(df["Review"].values):
+        review_split = split_review(review)
+        review_split_ = [x for x in review_split if len(x.split()) >= 3]
+        duplicate_dates = [str(df["Date"].values[i]) for _ in range(len(review_split_))]
+        raws = [x for x in review_split if len(x.split()) >= 3]
+        dates.extend(duplicate_dates)
+        raw_reviews.extend(raws)
+    return dates, raw_reviews
+
+
+def bench_split(args):
+    """Reviews/sec of the sentence splitting stage of app.py, the Python loop against review_pipeline"""
+    from review_pipeline import split_sentences
+
+    reviews, dates = load_raw_reviews()
+    repeats = -(-args.reviews // len(reviews))
+    df = pd.DataFrame({"Date": (dates * repeats)[:args.reviews], "Review": (reviews * repeats)[:args.reviews]})
+    print(f"{len(df)} reviews, best of {args.repeat} runs")
+
+    before_time, before = best_time(lambda: legacy_split_reviews(df), args.repeat)
+    print(f"  {'before':<8}{before_time:8.3f}s  {len(df) / before_time:12.0f} reviews/sec")
+    after_time, sentences = best_time(lambda: split_sentences(df), args.repeat)
+    print(f"  {'after':<8}{after_time:8.3f}s  {len(df) / after_time:12.0f} reviews/sec")
+
+    after = (sentences["Date"].tolist(), sentences["Raw_Review"].tolist())
+    assert before == after, "split sentences differ"
+    print(f"  outputs identical, {len(sentences)} sentences, {before_time / after_time:.1f}x faster")
+
+
+def legacy_add_data(data, aspect_list):
+    """app.add_data before the columnar rewrite, kept as the reference"""
+    rev_ = []
+    dates_ = []
+    aspects_ = []
+    description_ = []
+    raw_r = []
+
+    for i, j in enumerate(aspect_list):
+        if len(list(j.values())[0]) != 0:
+            length = len(list(j.values())[0])
+            rev_.extend([data["Review"].values[i] for k in range(length)])
+            dates_.extend([data["Date"].values[i] for k in range(length)])
+            raw_r.extend([data["Raw_Review"].values[i] for k in range(length)])
+            aspects_.extend([list(j.values())[0][h]["noun"] for h in range(length)])
+            description_.extend([list(j.values())[0][h]["adj"] for h in range(length)])
+        else:
+            rev_.append(data["Review"].values[i])
+            dates_.append(data["Date"].values[i])
+            raw_r.append(data["Raw_Review"].values[i])
+            aspects_.append('neutral')
+            description_.append('neutral')
+
+    return pd.DataFrame({
+        "Date": dates_, "Review": rev_, "Aspect": aspects_,
+        "Description": description_, "Raw_Review": raw_r
+    })
+
+
+def mock_aspect_pairs(sentences, seed=0):
+    """0 to 3 (noun, adj, rule) pairs per sentence drawn from its words, standing in for the spaCy rules"""
+    rng = random.Random(seed)
+    pairs = []
+    for sentence in sentences:
+        words = sentence.split() or ["neutral"]
+        pairs.append([(rng.choice(words), rng.choice(words), rng.randint(1, 7)) for _ in range(rng.choice((0, 1, 1, 2, 3)))])
+    return pairs
+
+
+def bench_aspects(args):
+    """Sentences/sec of the aspect explosion of app.py, the nested list add_data against review_pipeline"""
+    from review_pipeline import split_sentences, add_aspects
+
+    reviews, dates = load_raw_reviews()
+    sentences = split_sentences(pd.DataFrame({"Date": dates, "Review": reviews}))
+    repeats = -(-args.sentences // len(sentences))
+    data = pd.concat([sentences] * repeats, ignore_index=True).iloc[:args.sentences]
+    data.insert(1, "Review", data["Raw_Review"].str.lower())
+    pairs = mock_aspect_pairs(data["Raw_Review"])
+    print(f"{len(data)} sentences, {sum(map(len, pairs))} aspect pairs, best of {args.repeat} runs")
+
+    # the per-sentence dicts of bulk_extraction and the flat columns of bulk_extraction_columns
+    aspect_list = [{"aspect_pairs": [{"noun": A, "adj": M, "rule": rule} for A, M, rule in sentence_pairs]}
+                   for sentence_pairs in pairs]
+    columns = {"sentence_index": [], "noun": [], "adj": [], "rule": []}
+    for i, sentence_pairs in enumerate(pairs):
+        for A, M, rule in sentence_pairs:
+            for name, value in zip(columns, (i, A, M, rule)):
+                columns[name].append(value)
+
+    before_time, before = best_time(lambda: legacy_add_data(data, aspect_list), args.repeat)
+    print(f"  {'before':<8}{before_time:8.3f}s  {len(data) / before_time:12.0f} sentences/sec")
+    after_time, after = best_time(lambda: add_aspects(data, columns), args.repeat)
+    print(f"  {'after':<8}{after_time:8.3f}s  {len(data) / after_time:12.0f} sentences/sec")
+
+    assert before.astype(object).equals(after.astype(object)), "aspect rows differ"
+    print(f"  outputs identical, {len(after)} rows, {before_time / after_time:.1f}x faster")
+
+
+def bench_pairs(args):
+    """Memory of the aspect pairs of a corpus as per-pair dicts and as an AspectPairBuffer"""
+    import tracemalloc
+    from aspect_extraction import AspectPairBuffer
+    from review_pipeline import split_sentences
+
+    reviews, dates = load_raw_reviews()
+    sentences = split_sentences(pd.DataFrame({"Date": dates, "Review": reviews}))["Raw_Review"].tolist()
+    sentences = (sentences * -(-args.sentences // len(sentences)))[:args.sentences]
+    # new string objects per sentence, as spaCy creates them for every parsed token
+    pairs = [[(A.lower(), M.lower(), rule) for A, M, rule in sentence_pairs]
+             for sentence_pairs in mock_aspect_pairs(sentences)]
+    n_pairs = sum(map(len, pairs))
+    print(f"{len(sentences)} sentences, {n_pairs} aspect pairs")
+
+    def measure(name, build):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = build()
+        elapsed = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  {name:<8}{current / 1e6:8.1f} MB held  {peak / 1e6:8.1f} MB peak  {elapsed:6.2f}s")
+        return result, current
+
+    # copies of the strings inside the measurement, like the extractor makes them
+    dicts, dict_bytes = measure("dicts", lambda: [
+        {"aspect_pairs": [{"noun": "".join(A), "adj": "".join(M), "rule": rule} for A, M, rule in sentence_pairs]}
+        for sentence_pairs in pairs])
+
+    def build_buffer():
+        buffer = AspectPairBuffer(len(sentences))
+        for i, sentence_pairs in enumerate(pairs):
+            for A, M, rule in sentence_pairs:
+                buffer.append(i, "".join(A), "".join(M), rule)
+        return buffer
+
+    buffer, buffer_bytes = measure("buffer", build_buffer)
+    print(f"  {len(buffer.strings)} distinct strings, {buffer.nbytes / 1e6:.1f} MB of codes")
+
+    assert buffer.to_dicts(len(sentences)) == dicts, "buffer and dicts hold different pairs"
+    print(f"  outputs identical, buffer uses {dict_bytes / buffer_bytes:.1f}x less memory")
+
+
+def bench_corpus(args):
+    """Load time of the reviews from the CSV against the Parquet corpus, whole and for one month"""
+    import tempfile
+    from corpus_store import read_corpus, write_corpus
+
+    reviews, dates = load_raw_reviews()
+    repeats = -(-args.reviews // len(reviews))
+    df = pd.DataFrame({"Review": (reviews * repeats)[:args.reviews], "Date": (dates * repeats)[:args.reviews]})
+    df["page_number"] = df.index // 10 + 1
+    # in scrape order like the bundled CSVs, write_corpus stores the rows by date and read_corpus
+    # gives them back in this order
+    month = pd.to_datetime(df["Date"], format="mixed").max().to_period("M")
+    start, end = month.start_time.date(), month.end_time.date()
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path, corpus = os.path.join(directory, "reviews.csv"), os.path.join(directory, "reviews.parquet")
+        df.to_csv(csv_path, index=False)
+        write_corpus(df, corpus)
+        print(f"{len(df)} reviews, CSV {os.path.getsize(csv_path) / 1e6:.1f} MB, "
+              f"corpus {os.path.getsize(corpus) / 1e6:.1f} MB, best of {args.repeat} runs")
+
+        csv_time, from_csv = best_time(lambda: pd.read_csv(csv_path).dropna(), args.repeat)
+        print(f"  {'csv':<8}{csv_time:8.3f}s  {len(from_csv) / csv_time:12.0f} reviews/sec")
+        corpus_time, from_corpus = best_time(lambda: read_corpus(corpus).dropna(), args.repeat)
+        print(f"  {'corpus':<8}{corpus_time:8.3f}s  {len(from_corpus) / corpus_time:12.0f} reviews/sec")
+        month_time, from_month = best_time(lambda: read_corpus(corpus, start=start, end=end), args.repeat)
+        print(f"  {'month':<8}{month_time:8.3f}s  {len(from_month)} reviews of {month}")
+
+    days = pd.to_datetime(from_csv["Date"], format="mixed")
+    assert from_csv["Review"].tolist() == from_corpus["Review"].tolist(), "corpus reviews differ"
+    assert from_csv["Date"].tolist() == from_corpus["Date"].astype(str).tolist(), "corpus dates differ"
+    in_month = from_csv[days.dt.to_period("M").eq(month)]
+    assert in_month["Review"].tolist() == from_month["Review"].tolist(), "month reviews differ"
+    print(f"  outputs identical, {csv_time / corpus_time:.1f}x faster")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    rules = subparsers.add_parser("rules", help="dependency rules of aspect_extraction")
+    rules.add_argument("--repeat", type=int, default=5)
+    rules.set_defaults(func=bench_rules)
+
+    normalize = subparsers.add_parser("normalize", help="review cleaning of clean.py and app.py")
+    normalize.add_argument("--repeat", type=int, default=5)
+    normalize.set_defaults(func=bench_normalize)
+
+    scrape = subparsers.add_parser("scrape", help="sequential, threaded and asyncio scrapers on a mock server")
+    scrape.add_argument("--products", type=int, default=4)
+    scrape.add_argument("--pages", type=int, default=25)
+    scrape.add_argument("--latency", type=float, default=0.1, help="seconds the server takes per page")
+    scrape.add_argument("--concurrency", type=int, default=32)
+    scrape.add_argument("--parse-workers", type=int, default=os.cpu_count() or 1)
+    scrape.add_argument("--skip-sequential", action="store_true")
+    scrape.set_defaults(func=bench_scrape)
+
+    fetch = subparsers.add_parser("fetch", help="PageFetcher limits against a stub server serving a saved page")
+    fetch.add_argument("--page", default=SAVED_AMAZON_PAGE, help=f"saved review page (default: {SAVED_AMAZON_PAGE})")
+    fetch.add_argument("--pages", type=int, default=40)
+    fetch.add_argument("--latency", type=float, default=0.1, help="seconds the server takes per page")
+    fetch.add_argument("--concurrency", type=int, default=4)
+    fetch.add_argument("--rate", type=float, default=10.0, help="requests per second of the rate limited run")
+    fetch.set_defaults(func=bench_fetch)
+
+    parse = subparsers.add_parser("parse", help="BeautifulSoup and lxml review page parsers")
+    parse.add_argument("--pages", type=int, default=100, help="mock pages per site")
+    parse.add_argument("--html-dir", help="parse the saved *.html pages of this directory instead")
+    parse.add_argument("--site", default="amazon", choices=["amazon", "flipkart"], help="site of the saved pages")
+    parse.add_argument("--repeat", type=int, default=3)
+    parse.set_defaults(func=bench_parse)
+
+    split = subparsers.add_parser("split", help="sentence splitting of app.py")
+    split.add_argument("--reviews", type=int, default=100000, help="reviews, the raw CSVs repeated")
+    split.add_argument("--repeat", type=int, default=3)
+    split.set_defaults(func=bench_split)
+
+    aspects = subparsers.add_parser("aspects", help="aspect explosion (add_data) of app.py")
+    aspects.add_argument("--sentences", type=int, default=100000, help="sentences, those of the raw CSVs repeated")
+    aspects.add_argument("--repeat", type=int, default=3)
+    aspects.set_defaults(func=bench_aspects)
+
+    pairs = subparsers.add_parser("pairs", help="memory of the aspect pair formats")
+    pairs.add_argument("--sentences", type=int, default=1000000, help="sentences, those of the raw CSVs repeated")
+    pairs.set_defaults(func=bench_pairs)
+
+    corpus = subparsers.add_parser("corpus", help="review loading from the CSV and from the Parquet corpus")
+    corpus.add_argument("--reviews", type=int, default=1000000, help="reviews, the raw CSVs repeated")
+    corpus.add_argument("--repeat", type=int, default=3)
+    corpus.set_defaults(func=bench_corpus)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import hashlib
+import json
+import os
+import re
+
+from http_cache import normalize_url
+
+# Directory of the checkpoints of unfinished scrapes, one JSONL file per product
+CHECKPOINT_DIR = ".scrape_checkpoints"
+
+
+def checkpoint_key(site, product_id=None, url=None):
+    """Checkpoint key of a product: site and product id (ASIN, Flipkart pid), else a hash of its URL"""
+    if not product_id:
+        product_id = hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()[:16]
+    return f"{site}-{product_id}"
+
+
+class PageCheckpoint:
+    """
+    Append-only record of the review pages of one product scraped so far. Every completed
+    page is written as one JSON line {"page": n, "rows": [...]} and flushed at once, so a
+    scrape that dies halfway keeps every page before the failure and a restarted scrape only
+    fetches the pages missing from load(). A line cut short by a crash is ignored.
+
+    """
+
+    def __init__(self, key, directory=CHECKPOINT_DIR):
+        self.key = key
+        self.path = os.path.join(directory, re.sub(r"[^A-Za-z0-9_.-]", "_", key) + ".jsonl")
+
+    def load(self):
+        """{page number: rows} of the pages recorded, rows as tuples"""
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return {}
+
+        complete = data[:data.rfind(b"\n") + 1]
+        if len(complete) < len(data):
+            # drop the partial last line so the next record starts on a line of its own
+            with open(self.path, "r+b") as f:
+                f.truncate(len(complete))
+
+        pages = {}
+        for line in complete.splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            pages[record["page"]] = [tuple(row) for row in record["rows"]]
+        return pages
+
+    def record(self, page, rows):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"page": page, "rows": rows}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def discard(self):
+        """Removes the checkpoint once the scrape is complete"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
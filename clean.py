@@ -1,36 +1,35 @@
 import pandas as pd
-import nltk
-import re
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
+import numpy as np
+import argparse
+import base64
+import hashlib
+import json
 import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from normalizer import downloads, build_lemmatizer, build_stopwords, normalize_review, LemmaCache, LEMMA_CACHE_SIZE
 
-def downloads():
-    """Download required NLTK data"""
-    nltk.download('stopwords')
-    nltk.download('wordnet')
-    nltk.download('omw-1.4')
+# Lemmas are kept in this file between runs, set to None to not persist them
+LEMMA_CACHE_PATH = ".lemma_cache.json"
 
-def setup_cleaning():
+# Column names that are recognised as the review text
+REVIEW_COLUMNS = ['review_text', 'review', 'text', 'Review', 'Review_Text', 'reviews']
+
+# CSVs with more rows than this are split into chunks of this size across the batch workers
+CHUNK_ROWS = 50000
+
+# Chunks read ahead per batch worker, bounds the rows held in memory by the batch mode
+CHUNKS_PER_WORKER = 2
+
+# Manifest of the incremental mode, kept in the cleaned directory
+MANIFEST_NAME = ".clean_manifest.json"
+
+def setup_cleaning(cache_size=LEMMA_CACHE_SIZE, cache_path=LEMMA_CACHE_PATH):
     """Setup lemmatizer and stopwords for cleaning"""
     downloads()
-    
-    lemma = WordNetLemmatizer()
-    all_stopwords = stopwords.words('english')
-    
-    # Remove specific stopwords that we want to keep
-    stopwords_to_keep = [
-        'not', 'but', 'because', 'against', 'between', 'up', 'down', 
-        'in', 'out', 'once', 'before', 'after', 'few', 'more', 'most', 
-        'no', 'nor', 'same', 'some'
-    ]
-    
-    for word in stopwords_to_keep:
-        if word in all_stopwords:
-            all_stopwords.remove(word)
-    
-    return lemma, all_stopwords
+    return build_lemmatizer(maxsize=cache_size, path=cache_path), build_stopwords()
 
 def clean_aspect_spacy(reviews, lemma, all_stopwords):
     """
@@ -40,25 +39,31 @@ def clean_aspect_spacy(reviews, lemma, all_stopwords):
     if pd.isna(reviews) or reviews == "":
         return ""
     
-    statement = reviews.lower().strip()
-    statement = statement.replace("won't", "will not").replace("cannot", "can not").replace("can't", "can not") \
-        .replace("n't", " not").replace("what's", "what is").replace("it's", "it is") \
-        .replace("'ve", " have").replace("i'm", "i am").replace("'re", " are") \
-        .replace("he's", "he is").replace("she's", "she is").replace("*****", " ") \
-        .replace("%", " percent ").replace("₹", " rupee ").replace("$", " dollar ") \
-        .replace("€", " euro ").replace("'ll", " will").replace("doesn't", "does not")
-    statement = re.sub('[^a-zA-Z]', ' ', statement)  # replacing whatever isn't letters by an empty string
-    statement = statement.split()  # forming list of words in a given review
-    final_statement = [lemma.lemmatize(word) for word in statement if not word in set(all_stopwords)]
-    final_statement_ = ' '.join(final_statement)  # joining the words and forming the review again without stopwords
-    return final_statement_
-
-def clean_csv_reviews(csv_path):
+    return normalize_review(reviews, lemma.lemmatize, all_stopwords)
+
+def read_reviews_csv(csv_path, chunksize=None):
+    """
+    Read a reviews CSV with every column as text, so that a file read in chunks is written
+    back exactly like the same file read at once
+    """
+    return pd.read_csv(csv_path, dtype=str, chunksize=chunksize)
+
+def find_review_column(columns):
+    """Return the first column that holds the review text, or None"""
+    for col in columns:
+        if col in REVIEW_COLUMNS:
+            return col
+    return None
+
+def clean_csv_reviews(csv_path, cleaning=None, chunksize=None):
     """
     Clean reviews in a CSV file and save as clean_{original_name}.csv
     
     Args:
         csv_path (str): Path to the CSV file
+        cleaning (tuple): (lemma, all_stopwords) from setup_cleaning(), set up here when None
+        chunksize (int): Stream the CSV in chunks of this many rows, appending every cleaned
+            chunk to the output so that memory stays the same however large the file is
     
     Returns:
         str: Path to the cleaned CSV file
@@ -66,24 +71,21 @@ def clean_csv_reviews(csv_path):
     print(f"Processing: {csv_path}")
     
     # Setup cleaning components
-    lemma, all_stopwords = setup_cleaning()
+    lemma, all_stopwords = cleaning or setup_cleaning()
+    
+    if chunksize:
+        return clean_csv_reviews_streaming(csv_path, lemma, all_stopwords, chunksize)
     
     # Read CSV
     try:
-        df = pd.read_csv(csv_path)
+        df = read_reviews_csv(csv_path)
         print(f"Loaded CSV with {len(df)} rows and columns: {list(df.columns)}")
     except Exception as e:
         print(f"Error reading CSV: {e}")
         return None
     
     # Find review text column (look for common names)
-    review_column = None
-    possible_names = ['review_text', 'review', 'text', 'Review', 'Review_Text', 'reviews']
-    
-    for col in df.columns:
-        if col in possible_names:
-            review_column = col
-            break
+    review_column = find_review_column(df.columns)
     
     if review_column is None:
         print(f"Could not find review column. Available columns: {list(df.columns)}")
@@ -97,11 +99,11 @@ def clean_csv_reviews(csv_path):
     df[review_column] = df[review_column].apply(
         lambda x: clean_aspect_spacy(x, lemma, all_stopwords)
     )
+    print(lemma.summary())
+    lemma.save()
     
     # Create output filename
-    input_path = Path(csv_path)
-    output_filename = f"clean_{input_path.name}"
-    output_path = input_path.parent / output_filename
+    output_path = clean_output_path(csv_path)
     
     # Save cleaned CSV
     try:
@@ -117,17 +119,63 @@ def clean_csv_reviews(csv_path):
         print(f"Error saving CSV: {e}")
         return None
 
-def process_all_csvs_in_directory(directory="."):
+def clean_csv_reviews_streaming(csv_path, lemma, all_stopwords, chunksize):
+    """
+    Streaming version of clean_csv_reviews: reads the CSV chunksize rows at a time, cleans
+    each chunk and appends it to clean_{original_name}.csv. The output is identical to the
+    one of the non-streaming path.
+    """
+    output_path = clean_output_path(csv_path)
+    rows = 0
+    non_empty_reviews = 0
+    
+    try:
+        for i, chunk in enumerate(read_reviews_csv(csv_path, chunksize=chunksize)):
+            if i == 0:
+                review_column = find_review_column(chunk.columns)
+                if review_column is None:
+                    print(f"Could not find review column. Available columns: {list(chunk.columns)}")
+                    print("Please specify which column contains the review text.")
+                    return None
+                print(f"Found review column: '{review_column}'")
+                print(f"Cleaning reviews in chunks of {chunksize} rows...")
+            
+            chunk[review_column] = chunk[review_column].apply(
+                lambda x: clean_aspect_spacy(x, lemma, all_stopwords)
+            )
+            chunk.to_csv(output_path, mode='w' if i == 0 else 'a', header=i == 0,
+                         index=False, encoding='utf-8')
+            rows += len(chunk)
+            non_empty_reviews += int((chunk[review_column].str.strip() != '').sum())
+    except Exception as e:
+        print(f"Error cleaning CSV: {e}")
+        return None
+    
+    print(lemma.summary())
+    lemma.save()
+    print(f"Cleaned CSV saved as: {output_path}")
+    print(f"Successfully cleaned {non_empty_reviews} non-empty reviews out of {rows} rows")
+    return str(output_path)
+
+def clean_output_path(csv_path):
+    """Path of the clean_{original_name}.csv written next to the input"""
+    input_path = Path(csv_path)
+    return input_path.parent / f"clean_{input_path.name}"
+
+def find_csv_files(directory="."):
+    """CSV files of the directory that are not cleaned outputs themselves"""
+    return [os.path.join(directory, file) for file in sorted(os.listdir(directory))
+            if file.endswith('.csv') and not file.startswith('clean_')]
+
+def process_all_csvs_in_directory(directory=".", chunksize=None):
     """
     Process all CSV files in the given directory
     
     Args:
         directory (str): Directory path (default: current directory)
+        chunksize (int): Stream each CSV in chunks of this many rows (default: read at once)
     """
-    csv_files = []
-    for file in os.listdir(directory):
-        if file.endswith('.csv') and not file.startswith('clean_'):
-            csv_files.append(os.path.join(directory, file))
+    csv_files = find_csv_files(directory)
     
     if not csv_files:
         print("No CSV files found in the directory")
@@ -138,16 +186,250 @@ def process_all_csvs_in_directory(directory="."):
         print(f"  - {file}")
     
     print("\nProcessing files...")
+    cleaning = setup_cleaning()
     for csv_file in csv_files:
         print(f"\n{'='*50}")
-        result = clean_csv_reviews(csv_file)
+        result = clean_csv_reviews(csv_file, cleaning, chunksize)
         if result:
             print(f"✓ Successfully processed: {csv_file}")
         else:
             print(f"✗ Failed to process: {csv_file}")
 
+# Cleaning components of a batch worker process, set up once by _init_worker
+_worker_cleaning = None
+
+def _init_worker(cache_size, cache_path):
+    global _worker_cleaning
+    # The workers start from the saved lemmas but keep them in memory only, the lemmas they
+    # compute go back to the parent, which alone writes the cache file
+    lemma = LemmaCache(maxsize=cache_size, record_new=True)
+    if cache_path is not None and os.path.exists(cache_path):
+        lemma.load(cache_path)
+    _worker_cleaning = lemma, build_stopwords()
+
+def _read_chunks(csv_path, chunk_rows, state):
+    """Chunks of the CSV, an error reading it ends them and is kept in state["error"]"""
+    try:
+        yield from read_reviews_csv(csv_path, chunksize=chunk_rows)
+    except Exception as e:
+        state["error"] = e
+
+def _clean_chunk(chunk, review_column):
+    """
+    Clean one chunk of a CSV in a batch worker, returns the chunk, the seconds it took and the
+    lemmas computed for it
+    """
+    lemma, all_stopwords = _worker_cleaning
+    start = time.perf_counter()
+    chunk[review_column] = chunk[review_column].apply(
+        lambda x: clean_aspect_spacy(x, lemma, all_stopwords)
+    )
+    elapsed = time.perf_counter() - start
+    return chunk, elapsed, lemma.pop_new()
+
+def clean_directory_parallel(directory=".", workers=None, chunk_rows=CHUNK_ROWS,
+                             cache_size=LEMMA_CACHE_SIZE, cache_path=LEMMA_CACHE_PATH):
+    """
+    Clean all CSV files of the directory over a pool of worker processes. Stopwords and
+    lemmatizer are set up once per worker, and CSVs longer than chunk_rows are split into
+    chunks that are cleaned by different workers. Chunks are read as the workers need them,
+    at most CHUNKS_PER_WORKER per worker ahead, and appended to the output in order, so the
+    memory used does not grow with the size of the files.
+    
+    Args:
+        directory (str): Directory path (default: current directory)
+        workers (int): Number of worker processes (default: number of CPUs)
+        chunk_rows (int): Rows per task sent to a worker
+    
+    Returns:
+        list: Paths of the cleaned CSV files
+    """
+    csv_files = find_csv_files(directory)
+    if not csv_files:
+        print("No CSV files found in the directory")
+        return []
+    
+    workers = workers or os.cpu_count() or 1
+    print(f"Cleaning {len(csv_files)} CSV files with {workers} workers")
+    start = time.perf_counter()
+    downloads()  # once here, so the workers find the NLTK data already in place
+    lemma = build_lemmatizer(maxsize=cache_size, path=cache_path)
+    cleaned = []
+    total_rows = 0
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(cache_size, cache_path)) as pool:
+        pending = deque()  # (file state, chunk number, future) in submission order
+        
+        def write_oldest():
+            nonlocal total_rows
+            state, i, future = pending.popleft()
+            chunk, elapsed, new_lemmas = future.result()
+            lemma.update(new_lemmas)
+            if state["error"] is not None:
+                return
+            chunk.to_csv(state["output"], mode='w' if i == 0 else 'a', header=i == 0,
+                         index=False, encoding='utf-8')
+            state["rows"] += len(chunk)
+            state["seconds"] += elapsed
+            state["written"] += 1
+            if state["read_all"] and state["written"] == state["chunks"]:
+                rate = state["rows"] / state["seconds"] if state["seconds"] > 0 else 0.0
+                print(f"✓ {state['file']}: {state['rows']} rows in {state['chunks']} chunks, "
+                      f"{rate:.0f} rows/sec -> {state['output']}")
+                total_rows += state["rows"]
+                cleaned.append(str(state["output"]))
+        
+        for csv_file in csv_files:
+            state = {"file": csv_file, "output": clean_output_path(csv_file), "chunks": 0, "written": 0,
+                     "rows": 0, "seconds": 0.0, "read_all": False, "error": None}
+            for chunk in _read_chunks(csv_file, chunk_rows, state):
+                if state["chunks"] == 0:
+                    review_column = find_review_column(chunk.columns)
+                    if review_column is None:
+                        break
+                while len(pending) >= CHUNKS_PER_WORKER * workers:
+                    write_oldest()
+                pending.append((state, state["chunks"], pool.submit(_clean_chunk, chunk, review_column)))
+                state["chunks"] += 1
+            if state["error"] is not None:
+                print(f"✗ Error reading {csv_file}: {state['error']}")
+                if state["output"].exists() and state["written"]:
+                    state["output"].unlink()  # drop the part written so far
+                continue
+            if state["chunks"] == 0:
+                print(f"✗ Could not find review column in {csv_file}")
+                continue
+            # the last chunk of the file is still pending, write_oldest reports the file once it is written
+            state["read_all"] = True
+        
+        while pending:
+            write_oldest()
+    
+    lemma.save()
+    wall_time = time.perf_counter() - start
+    print(f"Cleaned {total_rows} rows of {len(cleaned)} files in {wall_time:.2f}s wall time")
+    return cleaned
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _row_hashes(df):
+    """64 bit hash of every row, over all of its columns"""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy(dtype=np.uint64)
+
+def _encode_hashes(hashes):
+    return base64.b64encode(hashes.astype('<u8').tobytes()).decode('ascii')
+
+def _decode_hashes(encoded):
+    return np.frombuffer(base64.b64decode(encoded), dtype='<u8').astype(np.uint64)
+
+def load_manifest(directory="."):
+    """Manifest of the incremental mode: size, mtime, sha256 and row hashes per input CSV"""
+    path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def save_manifest(manifest, directory="."):
+    path = os.path.join(directory, MANIFEST_NAME)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(f"{path}.tmp", path)
+
+def clean_csv_incremental(csv_path, entry, lemma, all_stopwords):
+    """
+    Clean a CSV again, reusing the cleaned review of every row whose hash is in the manifest
+    entry of the previous run, so only appended or modified rows go through the cleaner.
+    
+    Returns:
+        dict: New manifest entry of the file, or None when it could not be cleaned
+    """
+    output_path = clean_output_path(csv_path)
+    df = read_reviews_csv(csv_path)
+    review_column = find_review_column(df.columns)
+    if review_column is None:
+        print(f"✗ Could not find review column in {csv_path}")
+        return None
+    
+    hashes = _row_hashes(df)
+    reuse = np.zeros(len(df), dtype=bool)
+    
+    # The previous output can only be reused if it still lines up with its row hashes
+    if entry and output_path.exists():
+        previous_hashes = _decode_hashes(entry["rows"])
+        previous = read_reviews_csv(output_path)
+        if review_column in previous.columns and len(previous) == len(previous_hashes):
+            cleaned_by_hash = pd.Series(previous[review_column].to_numpy(), index=previous_hashes)
+            cleaned_by_hash = cleaned_by_hash[~cleaned_by_hash.index.duplicated()]
+            reuse = np.isin(hashes, previous_hashes)
+            df.loc[reuse, review_column] = cleaned_by_hash.reindex(hashes[reuse]).to_numpy()
+    
+    df.loc[~reuse, review_column] = df.loc[~reuse, review_column].apply(
+        lambda x: clean_aspect_spacy(x, lemma, all_stopwords)
+    )
+    df.to_csv(output_path, index=False, encoding='utf-8')
+    print(f"✓ {csv_path}: cleaned {int((~reuse).sum())} new or modified rows, "
+          f"reused {int(reuse.sum())} -> {output_path}")
+    
+    stat = os.stat(csv_path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": _file_sha256(csv_path),
+            "rows": _encode_hashes(hashes)}
+
+def clean_directory_incremental(directory="."):
+    """
+    Clean the CSV files of the directory, skipping every file that is unchanged since the
+    last incremental run. Changed files only have their appended or modified rows cleaned.
+    Sizes, mtimes and file and row hashes are kept in MANIFEST_NAME in the directory.
+    
+    Args:
+        directory (str): Directory path (default: current directory)
+    """
+    manifest = load_manifest(directory)
+    csv_files = find_csv_files(directory)
+    cleaning = None
+    cleaned = 0
+    skipped = 0
+    start = time.perf_counter()
+    
+    for csv_file in csv_files:
+        name = os.path.basename(csv_file)
+        entry = manifest.get(name)
+        if entry and clean_output_path(csv_file).exists():
+            stat = os.stat(csv_file)
+            if stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime"]:
+                skipped += 1
+                continue
+            if _file_sha256(csv_file) == entry["sha256"]:
+                entry["mtime"] = stat.st_mtime_ns  # touched but not modified
+                skipped += 1
+                continue
+        
+        if cleaning is None:
+            cleaning = setup_cleaning()
+        try:
+            new_entry = clean_csv_incremental(csv_file, entry, *cleaning)
+        except Exception as e:
+            print(f"✗ Failed to process {csv_file}: {e}")
+            continue
+        if new_entry is not None:
+            manifest[name] = new_entry
+            cleaned += 1
+    
+    if cleaning is not None:
+        print(cleaning[0].summary())
+        cleaning[0].save()
+    save_manifest(manifest, directory)
+    print(f"{cleaned} of {len(csv_files)} files cleaned, {skipped} unchanged, "
+          f"in {time.perf_counter() - start:.2f}s")
+
 # Example usage for specific files from your image
-def clean_specific_files():
+def clean_specific_files(chunksize=None):
     """Clean the specific CSV files visible in your image"""
     files_to_clean = [
         "iphone_15.csv",
@@ -157,26 +439,48 @@ def clean_specific_files():
     ]
     
     print("Cleaning specific files from your directory...")
+    cleaning = setup_cleaning()
     for file in files_to_clean:
         if os.path.exists(file):
             print(f"\n{'='*50}")
-            result = clean_csv_reviews(file)
+            result = clean_csv_reviews(file, cleaning, chunksize)
             if result:
                 print(f"✓ Successfully cleaned: {file}")
         else:
             print(f"File not found: {file}")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Clean the reviews of CSV files into clean_<name>.csv")
+    parser.add_argument("--batch", metavar="DIRECTORY",
+                        help="clean every CSV of DIRECTORY over a pool of worker processes")
+    parser.add_argument("--incremental", metavar="DIRECTORY",
+                        help="clean only the CSVs of DIRECTORY, and their rows, changed since the last run")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS,
+                        help=f"split CSVs into chunks of this many rows (default: {CHUNK_ROWS})")
+    parser.add_argument("--stream-rows", type=int, default=None,
+                        help="stream each CSV in chunks of this many rows, for files larger than memory")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    # Method 1: Clean all CSV files in current directory
-    print("Option 1: Process all CSV files in current directory")
-    print("Option 2: Process specific files from your image")
-    
-    choice = input("Enter 1 or 2 (or press Enter for option 1): ").strip()
+    args = parse_args()
     
-    if choice == "2":
-        clean_specific_files()
+    if args.batch:
+        clean_directory_parallel(args.batch, workers=args.workers, chunk_rows=args.chunk_rows)
+    elif args.incremental:
+        clean_directory_incremental(args.incremental)
     else:
-        process_all_csvs_in_directory()
+        # Method 1: Clean all CSV files in current directory
+        print("Option 1: Process all CSV files in current directory")
+        print("Option 2: Process specific files from your image")
+        
+        choice = input("Enter 1 or 2 (or press Enter for option 1): ").strip()
+        
+        if choice == "2":
+            clean_specific_files(args.stream_rows)
+        else:
+            process_all_csvs_in_directory(chunksize=args.stream_rows)
     
     print("\n" + "="*50)
-    print("Cleaning complete!")
\ No newline at end of file
+    print("Cleaning complete!")
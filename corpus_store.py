@@ -0,0 +1,136 @@
+"""
+Parquet copies of the review CSVs, read with column projection and date range filtering
+
+    python corpus_store.py                   # converts every *.csv of the directory
+    python corpus_store.py iphone_15.csv --force
+
+Every corpus file is zstd compressed with the Date column dictionary encoded, and has a Day
+column (Date parsed to a calendar date). Rows are stored in Day order, so the Day statistics
+of each row group cover a narrow range and read_corpus skips the row groups outside a date
+range. A Row column keeps the position of every review in the CSV, and read_corpus gives the
+reviews back in that order. Files are opened memory-mapped, so the processes reading the same corpus share the
+file pages of the OS cache instead of each reading a copy.
+
+"""
+import argparse
+import glob
+import os
+import tempfile
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Directory of the Parquet corpus files
+CORPUS_DIR = ".corpus"
+
+# Rows per row group, the unit read_corpus skips when filtering by date
+ROW_GROUP_SIZE = 100000
+
+COMPRESSION = "zstd"
+
+# Columns the analysis needs, read_corpus reads only these by default
+REVIEW_COLUMNS = ("Date", "Review")
+
+# Column with the position of each review in the CSV, read_corpus restores that order with it
+ROW_COLUMN = "Row"
+
+
+def corpus_path(csv_path, directory=CORPUS_DIR):
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(directory, f"{stem}.parquet")
+
+
+def write_corpus(df, path, row_group_size=ROW_GROUP_SIZE):
+    """
+    Writes the reviews of df to the Parquet file at path, with a dictionary encoded Date, a
+    Day column parsed from it (null where Date is no date) and the position of every row of df
+    in ROW_COLUMN. Rows are stored sorted by Day (stable, undated rows last) so that every row
+    group covers a narrow range of days. The file is
+    written to a temporary file of its own and then moved in place, so concurrent writers
+    of the same corpus never see a partial file.
+
+    """
+    day = pd.to_datetime(df["Date"].astype(str), format="mixed", errors="coerce").reset_index(drop=True)
+    order = day.sort_values(kind="stable", na_position="last").index.to_numpy()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.append_column("Day", pa.array(day.dt.date, type=pa.date32(), from_pandas=True))
+    table = table.append_column(ROW_COLUMN, pa.array(range(len(day)), type=pa.int64()))
+    table = table.take(order)
+    date_index = table.schema.get_field_index("Date")
+    table = table.set_column(date_index, "Date", pc.dictionary_encode(table.column("Date")))
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=directory, prefix=f"{os.path.basename(path)}.", suffix=".tmp",
+                                     delete=False) as f:
+        tmp_path = f.name
+    try:
+        pq.write_table(table, tmp_path, compression=COMPRESSION, row_group_size=row_group_size,
+                       use_dictionary=True, write_statistics=True)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def convert_csv(csv_path, directory=CORPUS_DIR, force=False):
+    """Corpus file of csv_path, (re)written when missing or older than the CSV"""
+    path = corpus_path(csv_path, directory)
+    if force or not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(csv_path):
+        write_corpus(pd.read_csv(csv_path), path)
+    return path
+
+
+def _day(value):
+    return pd.Timestamp(value).date() if value is not None else None
+
+
+def read_corpus(path, columns=REVIEW_COLUMNS, start=None, end=None):
+    """
+    Reviews of a corpus file as a dataframe in the row order of the CSV, with only `columns`
+    read (all of them but ROW_COLUMN for None) and only the rows whose Day is within start..end
+    (both included, dates or date strings) when either is given. Row groups entirely outside
+    the range are not read. Files written before ROW_COLUMN existed come back in Day order.
+
+    """
+    filters = []
+    if start is not None:
+        filters.append(("Day", ">=", _day(start)))
+    if end is not None:
+        filters.append(("Day", "<=", _day(end)))
+    has_rows = ROW_COLUMN in pq.read_schema(path, memory_map=True).names
+    if columns and has_rows:
+        columns = [*columns, ROW_COLUMN]
+    table = pq.read_table(path, columns=list(columns) if columns else None, filters=filters or None,
+                          memory_map=True)
+    if has_rows:
+        table = table.take(pc.sort_indices(table.column(ROW_COLUMN))).drop_columns([ROW_COLUMN])
+    return table.to_pandas()
+
+
+def load_reviews(csv_path, columns=REVIEW_COLUMNS, start=None, end=None, directory=CORPUS_DIR):
+    """Reviews of csv_path read from its corpus file, converted first when it is missing or stale"""
+    return read_corpus(convert_csv(csv_path, directory), columns, start, end)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csvs", nargs="*", help="CSV files to convert (default: every *.csv)")
+    parser.add_argument("--directory", default=CORPUS_DIR, help=f"corpus directory (default: {CORPUS_DIR})")
+    parser.add_argument("--force", action="store_true", help="rewrite corpus files that are up to date")
+    args = parser.parse_args()
+
+    for csv_path in args.csvs or sorted(glob.glob("*.csv")):
+        start = time.perf_counter()
+        path = convert_csv(csv_path, args.directory, args.force)
+        metadata = pq.read_metadata(path)
+        print(f"{csv_path} -> {path}: {metadata.num_rows} reviews, {metadata.num_row_groups} row groups, "
+              f"{os.path.getsize(csv_path) / 1e6:.2f} MB -> {os.path.getsize(path) / 1e6:.2f} MB "
+              f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
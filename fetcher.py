@@ -0,0 +1,326 @@
+import bisect
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Number of pages fetched at the same time
+MAX_WORKERS = 8
+
+# Requests per second sent to any one host
+REQUESTS_PER_SECOND = 5.0
+
+# (connect, read) timeouts of every request in seconds
+TIMEOUT = (5.0, 30.0)
+
+# A request failing with one of these statuses, a timeout or a connection error is retried
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_RETRIES = 4
+
+# Retries wait a random time up to BACKOFF_BASE * 2 ** attempt seconds, capped at BACKOFF_MAX
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+
+# Lowest adaptive rate of a host. A success adds RATE_INCREASE times the highest rate to it,
+# a failure multiplies it by RATE_DECREASE
+MIN_REQUESTS_PER_SECOND = 0.2
+RATE_INCREASE = 0.1
+RATE_DECREASE = 0.5
+
+# Upper bounds in seconds of the latency histogram buckets, the last bucket has no bound
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def backoff_delay(attempt, retry_after=None, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """
+    Seconds to wait before retry number attempt (0 for the first): exponential backoff with
+    full jitter, or the Retry-After of the server when it sent a number of seconds
+
+    """
+    if retry_after:
+        try:
+            return min(cap, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class HostRateLimiter:
+    """
+    Spaces the requests to every host at least 1 / requests_per_second apart, requests to
+    different hosts don't wait for each other. No limit when requests_per_second is falsy.
+
+    """
+
+    def __init__(self, requests_per_second=REQUESTS_PER_SECOND):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def _interval(self, host):
+        return self.interval
+
+    def reserve(self, url):
+        """
+        Takes the next free slot of the host of url and returns the seconds until it, without
+        waiting, so that threads and event loops can wait for it their own way
+        """
+        if not self.interval:
+            return 0.0
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self._interval(host)
+        return max(0.0, slot - time.monotonic())
+
+    def wait(self, url):
+        """Blocks until a request to the host of url may be sent"""
+        delay = self.reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+
+    def record(self, url, ok):
+        """Outcome of a request to url, a fixed rate limiter ignores it"""
+
+
+class AdaptiveRateLimiter(HostRateLimiter):
+    """
+    HostRateLimiter whose rate per host follows the outcome of the requests: every failure
+    (throttling status, server error, timeout) multiplies it by RATE_DECREASE and every success
+    adds RATE_INCREASE * max_rate to it, up to max_rate (default: the starting
+    requests_per_second). The scraper backs off quickly when a host starts refusing and
+    creeps back up while it answers.
+
+    """
+
+    def __init__(self, requests_per_second=REQUESTS_PER_SECOND, min_rate=MIN_REQUESTS_PER_SECOND, max_rate=None):
+        super().__init__(requests_per_second)
+        self.initial_rate = requests_per_second
+        self.min_rate = min_rate
+        self.max_rate = max_rate or requests_per_second
+        self.rates = {}
+
+    def _interval(self, host):
+        return 1.0 / self.rates.get(host, self.initial_rate)
+
+    def record(self, url, ok):
+        if not self.interval:
+            return
+        host = urlparse(url).netloc
+        with self._lock:
+            rate = self.rates.get(host, self.initial_rate)
+            if ok:
+                rate = min(self.max_rate, rate + RATE_INCREASE * self.max_rate)
+            else:
+                rate = max(self.min_rate, rate * RATE_DECREASE)
+            self.rates[host] = rate
+
+    def summary(self):
+        return ", ".join(f"{host} {rate:.2f} req/s" for host, rate in sorted(self.rates.items()))
+
+
+class LatencyHistogram:
+    """Thread safe histogram of request latencies over the LATENCY_BUCKETS bounds"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.total += seconds
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile (inf for the last bucket)"""
+        target = q / 100 * self.count
+        seen = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            seen += n
+            if n and seen >= target:
+                return bound
+        return 0.0
+
+    def summary(self):
+        if not self.count:
+            return "no requests"
+        lines = [f"{self.count} requests, mean {self.total / self.count * 1000:.0f}ms, "
+                 f"p50 <= {self.percentile(50) * 1000:.0f}ms, p95 <= {self.percentile(95) * 1000:.0f}ms"]
+        lower = 0.0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            if n:
+                lines.append(f"  {lower * 1000:>6.0f} - {bound * 1000:>6.0f}ms  {n}")
+            lower = bound
+        return "\n".join(lines)
+
+
+class RequestPolicy:
+    """
+    Throttling, retry and bookkeeping rules shared by PageFetcher and the asyncio engine of
+    async_scrape, which only differ in how they send a request and wait. Every attempt is
+    recorded with record(): its latency goes to the histogram and its outcome to the
+    AdaptiveRateLimiter. A failed attempt gets the delay before its retry from retry_delay(),
+    None once max_retries retries were spent.
+
+    """
+
+    def __init__(self, requests_per_second=REQUESTS_PER_SECOND, max_retries=MAX_RETRIES, rate_limiter=None):
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter(requests_per_second)
+        self.max_retries = max_retries
+        self.latency = LatencyHistogram()
+        self.retries = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def record(self, url, seconds, ok):
+        """One attempt at url that took `seconds`, not ok after a timeout, connection error or RETRY_STATUSES answer"""
+        self.latency.record(seconds)
+        self.rate_limiter.record(url, ok)
+
+    def retry_delay(self, attempt, retry_after=None):
+        """Seconds to wait before retrying failed attempt number attempt (0 for the first), None when it was the last"""
+        if attempt >= self.max_retries:
+            self._count("failures")
+            return None
+        self._count("retries")
+        return backoff_delay(attempt, retry_after)
+
+    def summary(self):
+        """Request latency histogram, retries and failures, and the current rate of every host"""
+        text = (f"Request latency: {self.latency.summary()}\n"
+                f"{self.retries} retries, {self.failures} failed pages")
+        if isinstance(self.rate_limiter, AdaptiveRateLimiter) and self.rate_limiter.rates:
+            text += f"\nAdaptive rates: {self.rate_limiter.summary()}"
+        return text
+
+
+def make_session(pool_size=MAX_WORKERS, headers=None):
+    """requests Session keeping up to pool_size keep-alive connections per host"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+class PageFetcher:
+    """
+    Fetches pages over one pooled keep-alive session, up to max_workers pages at a time,
+    with the requests to each host rate limited by an AdaptiveRateLimiter. With a ResponseCache
+    pages still fresh in the cache are served from disk without a request.
+
+    Every request has connect/read timeouts, and a timeout, connection error or RETRY_STATUSES
+    answer is retried up to max_retries times after a jittered exponential backoff before the
+    error is raised. The latency of every request is recorded in the latency histogram. The
+    rules are those of the RequestPolicy in self.policy.
+
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, requests_per_second=REQUESTS_PER_SECOND,
+                 headers=None, session=None, cache=None, timeout=TIMEOUT, max_retries=MAX_RETRIES,
+                 rate_limiter=None):
+        self.max_workers = max_workers
+        self.session = session or make_session(max_workers, headers)
+        self.policy = RequestPolicy(requests_per_second, max_retries, rate_limiter)
+        self.rate_limiter = self.policy.rate_limiter
+        self.latency = self.policy.latency
+        self.cache = cache
+        self.timeout = timeout
+
+    def _get(self, url, headers=None):
+        attempt = 0
+        while True:
+            self.rate_limiter.wait(url)
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                self.policy.record(url, time.perf_counter() - start, False)
+                delay = self.policy.retry_delay(attempt)
+                if delay is None:
+                    raise
+            else:
+                ok = response.status_code not in RETRY_STATUSES
+                self.policy.record(url, time.perf_counter() - start, ok)
+                if ok:
+                    return response
+                delay = self.policy.retry_delay(attempt, response.headers.get("Retry-After"))
+                if delay is None:
+                    response.raise_for_status()
+            time.sleep(delay)
+            attempt += 1
+
+    def fetch(self, url):
+        """Body of the page at url"""
+        if self.cache is not None:
+            return self.cache.fetch(url, self._get)
+        return self._get(url).content
+
+    def evict(self, url):
+        """Drops the cached page of url, e.g. one the parser found no reviews in"""
+        if self.cache is not None:
+            self.cache.evict(url)
+
+    def iter_fetch(self, urls):
+        """
+        Yields the body of every url in the order of urls. Up to max_workers pages are fetched
+        ahead of the one being consumed and no more, so memory is bounded by that window however
+        many urls there are, and the caller can work on a page while the next ones download.
+
+        """
+        urls = iter(urls)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            window = deque(pool.submit(self.fetch, url) for url in islice(urls, self.max_workers))
+            try:
+                while window:
+                    content = window.popleft().result()
+                    for url in islice(urls, 1):
+                        window.append(pool.submit(self.fetch, url))
+                    yield content
+            finally:
+                for future in window:
+                    future.cancel()
+
+    def fetch_all(self, urls):
+        """Fetches all urls concurrently and returns their bodies in the order of urls"""
+        urls = list(urls)
+        start = time.perf_counter()
+        pages = list(self.iter_fetch(urls))
+        elapsed = time.perf_counter() - start
+        print(f"Fetched {len(urls)} pages in {elapsed:.2f}s with {self.max_workers} workers")
+        return pages
+
+    def summary(self):
+        return self.policy.summary()
+
+    def close(self):
+        if self.cache is not None:
+            print(self.cache.summary())
+        if self.latency.count:
+            print(self.summary())
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
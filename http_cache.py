@@ -0,0 +1,118 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Directory of the cached pages
+CACHE_DIR = ".http_cache"
+
+# Seconds a cached page is used without asking the server again
+CACHE_TTL = 24 * 60 * 60
+
+
+def normalize_url(url):
+    """Cache key form of url: lowercase scheme and host, no default port, sorted query, no fragment"""
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+class ResponseCache:
+    """
+    On-disk cache of page bodies keyed by the normalized page URL, one gzip file per page.
+    A page younger than `ttl` seconds is served without any network I/O. An older one is
+    revalidated with its ETag / Last-Modified, and a 304 answer renews it without a download.
+    Every 200 answer is cached, a caller that finds it is no real page (a robot check served
+    with status 200) removes it with evict().
+
+    """
+
+    def __init__(self, directory=CACHE_DIR, ttl=CACHE_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+
+    def _path(self, url):
+        key = hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key[:2], f"{key}.gz")
+
+    def get(self, url):
+        """(header, body) cached for url, or None. The header has fetched_at, etag and last_modified."""
+        try:
+            with gzip.open(self._path(url), "rb") as f:
+                data = f.read()
+        except (OSError, EOFError):
+            return None
+        header, _, content = data.partition(b"\n")
+        return json.loads(header), content
+
+    def put(self, url, content, etag=None, last_modified=None):
+        path = self._path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        header = {"url": normalize_url(url), "fetched_at": time.time(),
+                  "etag": etag, "last_modified": last_modified}
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+            f.write(json.dumps(header).encode("utf-8") + b"\n" + content)
+        os.replace(tmp_path, path)
+
+    def evict(self, url):
+        """Removes the page of url from the cache, so the next fetch downloads it again"""
+        try:
+            os.remove(self._path(url))
+        except FileNotFoundError:
+            return
+        self._count("evicted")
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def fetch(self, url, get):
+        """
+        Body of url, from the cache while it is fresh. Otherwise get(url, headers) is called
+        to send the request, with conditional headers when a stale copy is cached, and must
+        return the requests Response.
+
+        """
+        cached = self.get(url)
+        headers = {}
+        if cached is not None:
+            header, content = cached
+            if time.time() - header["fetched_at"] < self.ttl:
+                self._count("hits")
+                return content
+            if header["etag"]:
+                headers["If-None-Match"] = header["etag"]
+            if header["last_modified"]:
+                headers["If-Modified-Since"] = header["last_modified"]
+
+        response = get(url, headers)
+        if cached is not None and response.status_code == 304:
+            self._count("revalidated")
+            self.put(url, content, header["etag"], header["last_modified"])
+            return content
+
+        self._count("misses")
+        if response.status_code == 200:
+            self.put(url, response.content, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        return response.content
+
+    def summary(self):
+        text = (f"Response cache: {self.hits} fresh hits, {self.revalidated} revalidated, "
+                f"{self.misses} downloaded")
+        if self.evicted:
+            text += f", {self.evicted} evicted"
+        return text
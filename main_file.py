@@ -16,6 +16,8 @@ from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 import datetime
 from dateutil.relativedelta import relativedelta
 import en_core_web_sm
+from scrape import scrape_reviews
+from sites import FLIPKART
 
 # import sys
 # sys.path.append(r"c:\users\rajpo\appdata\local\programs\python\python311\lib\site-packages")
@@ -26,6 +28,11 @@ import en_core_web_sm
 st.set_page_config(page_title='Product Summarization')
 st.title('Product Review Summarisation')
 
+# Parser backend for the Flipkart review pages, "lxml" or "bs4"
+FLIPKART_PARSER = "lxml"
+
+# Checkpoint every scraped page so that a scrape that fails halfway resumes where it stopped
+RESUME_SCRAPES = True
 
 ### 1. Extract Data
 
@@ -46,66 +53,11 @@ def main_file(webpage, page_number, pages_to_extract):
 
         """
 
-        webpage = webpage[:-1]
-        amazon_review = []
-        amazon_date = []
-
-        def scrape_data_amazon(webpage, page_number, pages_to_extract):
-            head = {
-  'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-  'Accept-Language': 'en-US,en;q=0.9',
-  'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36',
-}
-            if '&page=' in webpage:
-                webpage = webpage
-            else:
-                webpage = webpage + '&page='
-            next_page = webpage + str(page_number)
-            response = requests.get(str(next_page),headers=head) # headers=headers
-                                
-            #st.success(response)
-            soup = BeautifulSoup(response.content, "html.parser")
-            # print(soup)
-            soup_review = soup.findAll("div", {"class": "ZmyHeo"})
-            # soup_summary = soup.findAll("a",{"class":"a-size-base a-link-normal review-title a-color-base review-title-content a-text-bold"})
-            soup_date = soup.find_all(lambda tag: tag.name == 'p' and tag.get('class') == ['_2NsDsF'])  # 10 reviews
-            # print(soup_review)
-            for x in range(len(soup_review)):
-                amazon_review.append(soup_review[x].text.replace('READ MORE', '').strip())
-                amazon_date.append(soup_date[x].text.strip())
-                # amazon_summary.append(soup_summary[x].text.strip())
-
-            # Generating the next page url
-            if page_number < pages_to_extract:
-                page_number = page_number + 1
-                # print(page_number)
-                scrape_data_amazon(webpage, page_number, pages_to_extract)
-
-        scrape_data_amazon(webpage, page_number, pages_to_extract)
-        data_amazon = {'Date': amazon_date, 'Review': amazon_review}
-        df_amazon = pd.DataFrame(data_amazon, columns=['Date', 'Review'])
+        # Flipkart pages go through the shared fetch / parse / cache / checkpoint core of scrape.py
+        df_amazon = scrape_reviews(FLIPKART, webpage, page_number, pages_to_extract,
+                                   backend=FLIPKART_PARSER, resume=RESUME_SCRAPES)
         print(len(df_amazon))
 
-        def get_date_amazon(text):
-            if 'months ago' in text.lower() or 'month ago' in text.lower():
-                match = re.search(r'\d+', text)
-                if match:  # Ensure there is a match
-                    number = int(match.group(0))  # Extract the first matched number
-                    current_date = datetime.date.today()
-                    months_ago = current_date - relativedelta(months=number)
-                    formatted_result = months_ago.strftime('%B, %Y')
-                    return formatted_result
-
-            elif 'days ago' in text.lower() or 'day ago' in text.lower() or 'today' in text.lower():
-                res = datetime.date.today()
-                return res.strftime('%B, %Y')
-
-            else:
-                return text
-
-        df_amazon["Date"] = [get_date_amazon(x) for x in df_amazon["Date"].values]
-        df_amazon.dropna(inplace=True)
-
         #st.success(f"Scrapped len : {len(df_amazon)}")
         #print(f"Scrapped Reviews : {len(df_amazon)}")
 
@@ -0,0 +1,160 @@
+import json
+import os
+import re
+import tempfile
+from collections import OrderedDict
+
+import nltk
+from nltk.corpus import stopwords
+from nltk.stem import WordNetLemmatizer
+
+# Contractions and symbols expanded before cleaning, in the order the chained str.replace calls
+# applied them. No expansion contains an apostrophe or one of the symbols, so a single left to
+# right pass over the alternation below gives the same text as the chained replaces did.
+CONTRACTIONS = (
+    ("won't", "will not"), ("cannot", "can not"), ("can't", "can not"),
+    ("n't", " not"), ("what's", "what is"), ("it's", "it is"),
+    ("'ve", " have"), ("i'm", "i am"), ("'re", " are"),
+    ("he's", "he is"), ("she's", "she is"), ("*****", " "),
+    ("%", " percent "), ("₹", " rupee "), ("$", " dollar "),
+    ("€", " euro "), ("'ll", " will"), ("doesn't", "does not"),
+)
+
+# Stopwords that carry meaning for aspects and sentiment, so they are kept in the reviews
+STOPWORDS_TO_KEEP = [
+    'not', 'but', 'because', 'against', 'between', 'up', 'down',
+    'in', 'out', 'once', 'before', 'after', 'few', 'more', 'most',
+    'no', 'nor', 'same', 'some'
+]
+
+# Default number of words kept by LemmaCache
+LEMMA_CACHE_SIZE = 100000
+
+_EXPANSIONS = dict(CONTRACTIONS)
+_CONTRACTION_RE = re.compile('|'.join(re.escape(contraction) for contraction, _ in CONTRACTIONS))
+_WORD_RE = re.compile('[a-zA-Z]+')
+
+
+def downloads():
+    """Download required NLTK data"""
+    nltk.download('stopwords')
+    nltk.download('wordnet')
+    nltk.download('omw-1.4')
+
+
+def build_stopwords():
+    """English stopwords without STOPWORDS_TO_KEEP, as a set built once"""
+    return frozenset(word for word in stopwords.words('english') if word not in STOPWORDS_TO_KEEP)
+
+
+class LemmaCache:
+    """
+    Least recently used cache in front of WordNetLemmatizer.lemmatize, holding at most `maxsize`
+    words (no limit when None). With a `path` the cache is loaded from that JSON file when it
+    exists and written back by save(), so the lemmas survive between runs. With `record_new`
+    the lemmas computed since the last pop_new() are also kept, so that a process that does
+    not save the cache itself can hand them to one that does.
+
+    """
+
+    def __init__(self, maxsize=LEMMA_CACHE_SIZE, path=None, record_new=False):
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lemmatizer = WordNetLemmatizer()
+        self._lemmas = OrderedDict()
+        self._new = {} if record_new else None
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def lemmatize(self, word):
+        lemma = self._lemmas.get(word)
+        if lemma is not None:
+            self.hits += 1
+            self._lemmas.move_to_end(word)
+            return lemma
+
+        self.misses += 1
+        lemma = self._lemmatizer.lemmatize(word)
+        self._lemmas[word] = lemma
+        if self._new is not None:
+            self._new[word] = lemma
+        if self.maxsize is not None and len(self._lemmas) > self.maxsize:
+            self._lemmas.popitem(last=False)
+        return lemma
+
+    def __len__(self):
+        return len(self._lemmas)
+
+    def stats(self):
+        """Hit and miss counters since the cache was created"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits, "misses": self.misses, "size": len(self._lemmas),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def summary(self):
+        stats = self.stats()
+        return (f"Lemma cache: {stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate']:.1%} hit rate), {stats['size']} words cached")
+
+    def pop_new(self):
+        """{word: lemma} computed since the last call, empty without record_new"""
+        new = self._new or {}
+        if self._new is not None:
+            self._new = {}
+        return new
+
+    def load(self, path):
+        """Adds the lemmas stored in the JSON file, least recently used first"""
+        with open(path, encoding='utf-8') as f:
+            self.update(json.load(f))
+
+    def update(self, lemmas):
+        """Adds the {word: lemma} dict as the most recently used words"""
+        for word, lemma in lemmas.items():
+            self._lemmas[word] = lemma
+            self._lemmas.move_to_end(word)
+        while self.maxsize is not None and len(self._lemmas) > self.maxsize:
+            self._lemmas.popitem(last=False)
+
+    def save(self, path=None):
+        """
+        Writes the cache to `path` (default: the path it was created with) through a temporary
+        file of its own, so processes saving at the same time never see a partial file: the
+        last replace wins and the others are simply overwritten.
+
+        """
+        path = path or self.path
+        if path is None:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                        prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._lemmas, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def build_lemmatizer(maxsize=LEMMA_CACHE_SIZE, path=None):
+    """WordNet lemmatizer behind a LemmaCache, see LemmaCache for the arguments"""
+    return LemmaCache(maxsize=maxsize, path=path)
+
+
+def _expand(match):
+    return _EXPANSIONS[match.group()]
+
+
+def normalize_review(text, lemmatize, stopword_set):
+    """
+    Lowercases the review, expands the contractions, keeps only the words made of letters,
+    drops the stopwords and lemmatizes the rest
+
+    """
+    statement = _CONTRACTION_RE.sub(_expand, text.lower().strip())
+    return ' '.join([lemmatize(word) for word in _WORD_RE.findall(statement) if word not in stopword_set])
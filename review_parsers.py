@@ -0,0 +1,87 @@
+from bs4 import BeautifulSoup
+from lxml import etree
+
+AMAZON_REVIEW_CLASS = "a-row a-spacing-small review-data"
+AMAZON_SUMMARY_CLASS = "a-size-base a-link-normal review-title a-color-base review-title-content a-text-bold"
+AMAZON_DATE_CLASS = "a-size-base a-color-secondary review-date"
+FLIPKART_REVIEW_CLASS = "ZmyHeo"
+FLIPKART_DATE_CLASS = "_2NsDsF"
+
+# Every site has a BeautifulSoup and an lxml parser. The lxml ones evaluate precompiled XPath
+# expressions selecting the same elements as the BeautifulSoup lookups, several times faster.
+# Backend used for a site when get_parser is not asked for one
+DEFAULT_BACKENDS = {"amazon": "lxml", "flipkart": "lxml"}
+
+# Both sites serve UTF-8, a fixed encoding also keeps lxml from guessing from the bytes
+_HTML_PARSER = etree.HTMLParser(encoding="utf-8")
+
+# BeautifulSoup matches a class string with spaces against the whole attribute value
+_AMAZON_REVIEWS = etree.XPath(f'//div[@class="{AMAZON_REVIEW_CLASS}"]')
+_AMAZON_SUMMARIES = etree.XPath(f'//a[@class="{AMAZON_SUMMARY_CLASS}"]')
+_AMAZON_DATES = etree.XPath(f'//span[@class="{AMAZON_DATE_CLASS}"]')
+# and a class without spaces against each of the classes of the tag
+_FLIPKART_REVIEWS = etree.XPath(
+    f'//div[contains(concat(" ", normalize-space(@class), " "), " {FLIPKART_REVIEW_CLASS} ")]'
+)
+_FLIPKART_DATES = etree.XPath(f'//p[normalize-space(@class)="{FLIPKART_DATE_CLASS}"]')
+_TEXT = etree.XPath("string()")
+
+
+def _lxml_root(content):
+    if not content:
+        return None
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return etree.fromstring(content, _HTML_PARSER)
+
+
+def parse_amazon_bs4(content):
+    soup = BeautifulSoup(content, "html.parser")
+    soup_review = soup.findAll("div", {"class": AMAZON_REVIEW_CLASS})
+    soup_summary = soup.findAll("a", {"class": AMAZON_SUMMARY_CLASS})
+    soup_date = soup.findAll("span", {"class": AMAZON_DATE_CLASS})[2:]  # 10 reviews
+    min_len = min(len(soup_review), len(soup_date), len(soup_summary))
+    return [(soup_date[x].text.strip(), soup_review[x].text.strip(), soup_summary[x].text.strip())
+            for x in range(min_len)]
+
+
+def parse_amazon_lxml(content):
+    root = _lxml_root(content)
+    if root is None:
+        return []
+    reviews = _AMAZON_REVIEWS(root)
+    summaries = _AMAZON_SUMMARIES(root)
+    dates = _AMAZON_DATES(root)[2:]  # 10 reviews
+    return [(_TEXT(date).strip(), _TEXT(review).strip(), _TEXT(summary).strip())
+            for date, review, summary in zip(dates, reviews, summaries)]
+
+
+def parse_flipkart_bs4(content):
+    soup = BeautifulSoup(content, "html.parser")
+    soup_review = soup.findAll("div", {"class": FLIPKART_REVIEW_CLASS})
+    soup_date = soup.find_all(lambda tag: tag.name == 'p' and tag.get('class') == [FLIPKART_DATE_CLASS])
+    return [(date.text.strip(), review.text.replace('READ MORE', '').strip())
+            for date, review in zip(soup_date, soup_review)]
+
+
+def parse_flipkart_lxml(content):
+    root = _lxml_root(content)
+    if root is None:
+        return []
+    return [(_TEXT(date).strip(), _TEXT(review).replace('READ MORE', '').strip())
+            for date, review in zip(_FLIPKART_DATES(root), _FLIPKART_REVIEWS(root))]
+
+
+PARSERS = {
+    "amazon": {"bs4": parse_amazon_bs4, "lxml": parse_amazon_lxml},
+    "flipkart": {"bs4": parse_flipkart_bs4, "lxml": parse_flipkart_lxml},
+}
+
+
+def get_parser(site, backend=None):
+    """Page parser of the site for the backend ("bs4" or "lxml", default: DEFAULT_BACKENDS)"""
+    backend = backend or DEFAULT_BACKENDS[site]
+    try:
+        return PARSERS[site][backend]
+    except KeyError:
+        raise ValueError(f"No {backend!r} parser for site {site!r}") from None
@@ -0,0 +1,111 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from aspect_extraction import bulk_extraction_columns
+from normalizer import normalize_review
+from sentiment import batched_sentiment_scores
+
+# Part of the version of precomputed analyses, to be bumped whenever a stage changes its output
+PIPELINE_VERSION = 1
+
+# Reviews are split into sentences at these delimiters, the words are matched anywhere
+REVIEW_DELIMITERS = (".", "but", "and", "also")
+SPLIT_PATTERN = re.compile('|'.join(map(re.escape, REVIEW_DELIMITERS)))
+
+# Sentences with fewer words than this are dropped
+MIN_SENTENCE_WORDS = 3
+
+# Matches at the start of a piece with at least MIN_SENTENCE_WORDS whitespace separated words,
+# the same test as len(piece.split()) >= MIN_SENTENCE_WORDS without building the word list
+_MIN_WORDS_PATTERN = re.compile(r"\s*" + r"\s+".join([r"\S+"] * (MIN_SENTENCE_WORDS - 1) + [r"\S"]))
+
+
+def split_sentences(df):
+    """
+    Date, Raw_Review frame with one row per sentence of the reviews in df, split at
+    REVIEW_DELIMITERS and keeping the sentences of at least MIN_SENTENCE_WORDS words. Each
+    sentence carries the Date of its review (as a string), rows are in review order.
+
+    """
+    sentences = pd.DataFrame({
+        "Date": df["Date"].astype(str).to_numpy(),
+        "Raw_Review": df["Review"].str.split(SPLIT_PATTERN).to_numpy(),
+    }).explode("Raw_Review", ignore_index=True)
+    keep = sentences["Raw_Review"].str.match(_MIN_WORDS_PATTERN, na=False).to_numpy(dtype=bool)
+    return sentences[keep].reset_index(drop=True)
+
+
+def normalize_sentences(sentences, lemmatize, stopword_set):
+    """normalize_review of every sentence, each distinct sentence is normalized once"""
+    cleaned = {text: normalize_review(text, lemmatize, stopword_set) for text in pd.unique(sentences)}
+    return sentences.map(cleaned)
+
+
+def get_splitted_reviews(df, lemmatize, stopword_set):
+    """Date, Review, Raw_Review frame of the sentences of the reviews, Review being the normalized sentence"""
+    sentences = split_sentences(df)
+    return pd.DataFrame({
+        "Date": sentences["Date"],
+        "Review": normalize_sentences(sentences["Raw_Review"], lemmatize, stopword_set),
+        "Raw_Review": sentences["Raw_Review"],
+    })
+
+
+def add_aspects(data, pairs):
+    """
+    Date, Review, Aspect, Description, Raw_Review frame with one row per aspect pair of every
+    sentence of data, pairs being the columns of aspect_extraction.bulk_extraction_columns.
+    A sentence without pairs keeps one row with 'neutral' Aspect and Description. The rows
+    of a sentence are taken from data with a single positional take over all pairs.
+
+    """
+    index = np.asarray(pairs["sentence_index"], dtype=np.int64)
+    has_pairs = np.zeros(len(data), dtype=bool)
+    has_pairs[index] = True
+    neutral = np.flatnonzero(~has_pairs)
+
+    # the pairs are in sentence order already, a stable sort slots the neutral rows in between
+    rows = np.concatenate([index, neutral])
+    order = np.argsort(rows, kind="stable")
+    aspects = np.concatenate([np.asarray(pairs["noun"], dtype=object), np.full(len(neutral), "neutral", dtype=object)])
+    descriptions = np.concatenate([np.asarray(pairs["adj"], dtype=object), np.full(len(neutral), "neutral", dtype=object)])
+
+    result = data[["Date", "Review", "Raw_Review"]].iloc[rows[order]].reset_index(drop=True)
+    result.insert(2, "Aspect", aspects[order])
+    result.insert(3, "Description", descriptions[order])
+    return result
+
+
+def add_sentiments(data, sentiment_pipe, batch_size=32, cache=None):
+    """Sentiment, Score, Year and Month of every row of data, sorted by Date"""
+    sentiment_, compound = batched_sentiment_scores(
+        data["Review"].values, sentiment_pipe, batch_size=batch_size, cache=cache
+    )
+
+    data["Sentiment"] = sentiment_
+    data["Score"] = compound
+    data["Date"] = pd.to_datetime(data['Date'])
+    data.sort_values(by='Date', inplace=True)
+    data["Year"] = pd.DatetimeIndex(data['Date']).year
+    data["Month"] = pd.DatetimeIndex(data['Date']).month
+
+    return data.reset_index().drop(["index"], axis=1)
+
+
+def analyze_reviews(df, nlp, sentiment_pipe, lemma, stopword_set, spacy_batch_size=1000, spacy_n_process=1,
+                    sentiment_batch_size=32, aspect_cache=None, sentiment_cache=None):
+    """
+    Runs the whole analysis over the Date, Review frame df: sentence splitting and cleaning,
+    aspect extraction and sentiment. Returns the Date, Review, Aspect, Description,
+    Raw_Review, Sentiment, Score, Year, Month frame the dashboard shows.
+
+    """
+    sentences = get_splitted_reviews(df, lemma.lemmatize, stopword_set)
+    print(lemma.summary())
+
+    pairs = bulk_extraction_columns(sentences["Review"].tolist(), nlp, batch_size=spacy_batch_size,
+                                    n_process=spacy_n_process, cache=aspect_cache)
+    data = add_aspects(sentences, pairs)
+    return add_sentiments(data, sentiment_pipe, batch_size=sentiment_batch_size, cache=sentiment_cache)
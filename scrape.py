@@ -1,25 +1,106 @@
-import requests
-import json
-import pandas as pd
-from bs4 import BeautifulSoup
 import time
-import re
-from urllib.parse import urlparse, parse_qs
-import streamlit as st
-import timeit
+from fetcher import PageFetcher
+from http_cache import ResponseCache
+from sites import AMAZON
+from scrape_pipeline import iter_pipelined_pages
 
-def extract_asin_from_url(input_url):
-    """Extract ASIN from Amazon product review URL"""
-    # Pattern to match ASIN in the URL
-    asin_pattern = r'/product-reviews/([A-Z0-9]{10})/'
-    match = re.search(asin_pattern, input_url)
-    if match:
-        return match.group(1)
-    else:
-        raise ValueError("Could not extract ASIN from URL")
 
+def iter_review_pages(site, webpage, page_number, pages_to_extract, fetcher=None, backend=None, skip=()):
+    """
+    Yields (page number, rows) for the review pages of a SiteAdapter's product in page order,
+    each as soon as it is parsed. The pages are fetched concurrently by a PageFetcher a bounded
+    window ahead of the consumer. When no fetcher is given one is created with the site's
+    headers and the default on-disk ResponseCache, so pages fetched within its TTL are not
+    downloaded again. A page without any review (a robot check, a page past the last one) is
+    evicted from the cache once parsed, so it is downloaded again next time. Page numbers in
+    skip are neither fetched nor yielded.
+
+    """
+    own_fetcher = fetcher is None
+    fetcher = fetcher or PageFetcher(headers=site.headers, cache=ResponseCache())
+    try:
+        pages = [(page, url) for page, url in site.page_urls(webpage, page_number, pages_to_extract)
+                 if page not in skip]
+        for (page, url), content in zip(pages, fetcher.iter_fetch(url for _, url in pages)):
+            rows = site.parse(content, backend)
+            if not rows:
+                fetcher.evict(url)
+            yield page, rows
+    finally:
+        if own_fetcher:
+            fetcher.close()
+
+
+def scrape_reviews(site, webpage, page_number, pages_to_extract, fetcher=None, backend=None, resume=False,
+                   parse_workers=0):
+    """
+    Scrapes review pages page_number to pages_to_extract of a product of the SiteAdapter site
+    and returns the dataframe of their reviews, see iter_review_pages. With parse_workers the
+    pages are parsed by that many processes while the next ones download, see
+    scrape_pipeline.iter_pipelined_pages.
 
-def scrape_amazon_reviews(webpage, page_number, pages_to_extract):
+    With resume every page is checkpointed as soon as it is parsed, and a scrape of the same
+    product that failed before only fetches the pages it had not finished. Those pages are
+    evicted from the fetcher's cache first, so a page that came back without reviews is
+    really requested again. The checkpoint is removed once all pages are scraped.
+
+    """
+    start = time.perf_counter()
+    checkpoint = site.checkpoint(webpage) if resume else None
+    done = checkpoint.load() if checkpoint else {}
+    own_fetcher = fetcher is None
+    fetcher = fetcher or PageFetcher(headers=site.headers, cache=ResponseCache())
+    if done:
+        print(f"Resuming from checkpoint with {len(done)} pages already scraped")
+        for page, url in site.page_urls(webpage, page_number, pages_to_extract):
+            if page not in done:
+                fetcher.evict(url)
+
+    pages = dict(done)
+    try:
+        if parse_workers:
+            scraped = iter_pipelined_pages(site, webpage, page_number, pages_to_extract, fetcher, backend,
+                                           skip=done, parse_workers=parse_workers)
+        else:
+            scraped = iter_review_pages(site, webpage, page_number, pages_to_extract, fetcher, backend, skip=done)
+        for page, page_rows in scraped:
+            pages[page] = page_rows
+            if checkpoint and page_rows:    # a page without reviews is fetched again on resume
+                checkpoint.record(page, page_rows)
+    finally:
+        if own_fetcher:
+            fetcher.close()
+
+    last_page = max(page_number, pages_to_extract)
+    rows = [row for page in sorted(pages) if page_number <= page <= last_page for row in pages[page]]
+    print(f"Scraped {len(rows)} {site.name} reviews from {len(pages) - len(done)} pages "
+          f"in {time.perf_counter() - start:.2f}s")
+    if checkpoint:
+        checkpoint.discard()
+    return site.frame(rows)
+
+
+def amazon_page_urls(webpage, page_number, pages_to_extract):
+    """URLs of the review pages page_number to pages_to_extract, the URL ends with its page number"""
+    return [url for _, url in AMAZON.page_urls(webpage, page_number, pages_to_extract)]
+
+
+def parse_amazon_page(content, backend=None):
+    """(date, review, summary) of every review on one Amazon review page, parsed by the "bs4" or "lxml" backend"""
+    return AMAZON.parse(content, backend)
+
+
+def get_date_amazon(text):
+    return AMAZON.normalize_date(text)
+
+
+def amazon_reviews_frame(rows):
+    """Date, Review, Summary dataframe of the (date, review, summary) rows parsed from the pages"""
+    return AMAZON.frame(rows)
+
+
+def scrape_amazon_reviews(webpage, page_number, pages_to_extract, fetcher=None, backend=None, resume=False,
+                          parse_workers=0):
 
     """
     Given a URL,page number and number of pages to extract; this function extracts review, date, summary
@@ -27,42 +108,7 @@ def scrape_amazon_reviews(webpage, page_number, pages_to_extract):
 
     """
 
-    webpage = webpage[:-1]
-    amazon_review = []
-    amazon_date = []
-    amazon_summary = []
-
-    def scrape_data_amazon(webpage, page_number, pages_to_extract):
-        next_page = webpage + str(page_number)
-        response= requests.get(str(next_page))
-        soup = BeautifulSoup(response.content,"html.parser")
-        soup_review = soup.findAll("div",{"class":"a-row a-spacing-small review-data"})
-        soup_summary = soup.findAll("a",{"class":"a-size-base a-link-normal review-title a-color-base review-title-content a-text-bold"})
-        soup_date = soup.findAll("span",{"class":"a-size-base a-color-secondary review-date"})[2:] # 10 reviews
-        min_len = min(len(soup_review), len(soup_date), len(soup_summary))
-        for x in range(min_len):
-            amazon_review.append(soup_review[x].text.strip())
-            amazon_date.append(soup_date[x].text.strip())
-            amazon_summary.append(soup_summary[x].text.strip())
-
-   #Generating the next page url
-        if page_number < pages_to_extract:
-            page_number = page_number + 1
-            #print(page_number)
-            scrape_data_amazon(webpage, page_number,pages_to_extract)
-
-    scrape_data_amazon(webpage, page_number, pages_to_extract)
-    data_amazon = {'Date':amazon_date, 'Review': amazon_review, 'Summary':amazon_summary}
-    df_amazon = pd.DataFrame(data_amazon, columns = ['Date','Review','Summary'])
-
-    def get_date_amazon(text):
-        return ' '.join(text.split()[-3:])
-
-    df_amazon["Date"] = [get_date_amazon(x) for x in df_amazon["Date"].values]
-    df_amazon.dropna(inplace = True)
-
-    return df_amazon
-
+    return scrape_reviews(AMAZON, webpage, page_number, pages_to_extract, fetcher, backend, resume, parse_workers)
 
 
 # def scrape_amazon_reviews(input_url, max_pages=5, delay=1):
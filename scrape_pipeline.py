@@ -0,0 +1,158 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from fetcher import PageFetcher
+from http_cache import ResponseCache
+from sites import get_site
+
+# Processes parsing pages
+PARSE_WORKERS = os.cpu_count() or 1
+
+# Fetched pages waiting for a parse worker, the fetch threads block while the queue is full
+QUEUE_SIZE = 32
+
+# put on the queue by every fetch thread when it has no page left
+_DONE = object()
+
+
+class StageCounter:
+    """Pages, bytes, busy seconds and wall time of one pipeline stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.pages = 0
+        self.bytes = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+        self.start = time.perf_counter()
+        self.end = None
+        self._lock = threading.Lock()
+
+    def add(self, n_bytes, busy, blocked=0.0):
+        with self._lock:
+            self.pages += 1
+            self.bytes += n_bytes
+            self.busy += busy
+            self.blocked += blocked
+
+    def stop(self):
+        if self.end is None:
+            self.end = time.perf_counter()
+
+    def summary(self):
+        wall = (self.end or time.perf_counter()) - self.start
+        rate = self.pages / wall if wall > 0 else 0.0
+        text = (f"{self.name}: {self.pages} pages, {self.bytes / 1e6:.1f} MB in {wall:.2f}s "
+                f"({rate:.1f} pages/sec, {self.busy:.2f}s busy")
+        if self.blocked:
+            text += f", {self.blocked:.2f}s blocked on a full queue"
+        return text + ")"
+
+
+def _parse_page(site_name, backend, content):
+    start = time.perf_counter()
+    rows = get_site(site_name).parse(content, backend)
+    return rows, time.perf_counter() - start
+
+
+def iter_pipelined_pages(site, webpage, page_number, pages_to_extract, fetcher=None, backend=None, skip=(),
+                         parse_workers=PARSE_WORKERS, queue_size=QUEUE_SIZE, max_pending=None):
+    """
+    Pipelined version of scrape.iter_review_pages: network and parsing overlap in two stages.
+    fetcher.max_workers fetch threads push the raw pages onto a queue holding at most
+    queue_size pages, and parse_workers processes parse them, with at most max_pending
+    (default: 2 * parse_workers) pages handed to the processes at a time. When parsing falls
+    behind the queue fills up and the fetch threads wait, so memory stays bounded.
+
+    Yields (page number, rows) in the order the pages are parsed, not in page order. Pages
+    without reviews are evicted from the fetcher's cache like in iter_review_pages. The
+    throughput of both stages is printed at the end.
+
+    """
+    max_pending = max_pending or 2 * parse_workers
+    own_fetcher = fetcher is None
+    fetcher = fetcher or PageFetcher(headers=site.headers, cache=ResponseCache())
+    pages = iter([(page, url) for page, url in site.page_urls(webpage, page_number, pages_to_extract)
+                  if page not in skip])
+    pages_lock = threading.Lock()
+    raw_pages = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    fetch_stage = StageCounter("fetch")
+    parse_stage = StageCounter("parse")
+
+    def put(item):
+        # gives up when the consumer is gone instead of blocking on a queue nobody reads
+        while not stop.is_set():
+            try:
+                raw_pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def fetch_worker():
+        try:
+            while not stop.is_set():
+                with pages_lock:
+                    page, url = next(pages, (None, None))
+                if url is None:
+                    break
+                start = time.perf_counter()
+                content = fetcher.fetch(url)
+                fetched = time.perf_counter()
+                if not put((page, url, content)):
+                    break
+                fetch_stage.add(len(content), fetched - start, time.perf_counter() - fetched)
+        except Exception as exc:
+            put(exc)
+        finally:
+            put(_DONE)
+
+    n_fetchers = max(1, fetcher.max_workers)
+    threads = [threading.Thread(target=fetch_worker, daemon=True) for _ in range(n_fetchers)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        with ProcessPoolExecutor(max_workers=parse_workers) as pool:
+            pending = {}
+            running = n_fetchers
+            while running or pending:
+                # hand pages to the parse processes while they have room
+                while running and len(pending) < max_pending:
+                    try:
+                        item = raw_pages.get(timeout=0.05 if pending else None)
+                    except queue.Empty:
+                        break
+                    if item is _DONE:
+                        running -= 1
+                        if not running:
+                            fetch_stage.stop()
+                    elif isinstance(item, Exception):
+                        raise item
+                    else:
+                        page, url, content = item
+                        pending[pool.submit(_parse_page, site.name, backend, content)] = (page, url, len(content))
+                if not pending:
+                    continue
+                done, _ = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+                for future in done:
+                    page, url, n_bytes = pending.pop(future)
+                    rows, busy = future.result()
+                    parse_stage.add(n_bytes, busy)
+                    if not rows:
+                        fetcher.evict(url)
+                    yield page, rows
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        fetch_stage.stop()
+        parse_stage.stop()
+        print(fetch_stage.summary())
+        print(parse_stage.summary())
+        if own_fetcher:
+            fetcher.close()
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# SQLite file of the results cached on disk, shared by all models
+SENTENCE_CACHE_PATH = ".sentence_cache.sqlite"
+
+# Results kept in memory per cache
+SENTENCE_CACHE_SIZE = 200000
+
+# SQLite allows at most 999 parameters per statement in older versions
+_SQL_CHUNK = 900
+
+
+class SentenceCache:
+    """
+    Content addressed cache of per-sentence model results, e.g. the aspect pairs or the
+    sentiment of a cleaned sentence. Results are keyed by a sha256 of `namespace` (the kind of
+    result plus the model and its version) and the sentence text, so a new model version
+    never sees the results of the old one.
+
+    Two tiers: a least recently used dict of up to `maxsize` results in memory and, with a
+    `path`, a SQLite table on disk that keeps them between runs and processes. Values must be
+    JSON serializable.
+
+    """
+
+    def __init__(self, namespace, path=SENTENCE_CACHE_PATH, maxsize=SENTENCE_CACHE_SIZE):
+        self.namespace = namespace
+        self.path = path
+        self.maxsize = maxsize
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS sentences (key BLOB PRIMARY KEY, value TEXT NOT NULL)")
+            self._db.commit()
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.namespace}\0{text}".encode("utf-8")).digest()
+
+    def _remember(self, text, value):
+        self._memory[text] = value
+        self._memory.move_to_end(text)
+        if self.maxsize is not None and len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def get_many(self, texts):
+        """{text: value} of the distinct texts that are cached, looked up in memory then on disk"""
+        found = {}
+        missing = []
+        with self._lock:
+            for text in dict.fromkeys(texts):
+                if text in self._memory:
+                    self._memory.move_to_end(text)
+                    found[text] = self._memory[text]
+                else:
+                    missing.append(text)
+            self.memory_hits += len(found)
+
+            if missing and self._db is not None:
+                by_key = {self._key(text): text for text in missing}
+                keys = list(by_key)
+                for begin in range(0, len(keys), _SQL_CHUNK):
+                    chunk = keys[begin:begin + _SQL_CHUNK]
+                    rows = self._db.execute(
+                        f"SELECT key, value FROM sentences WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                    )
+                    for key, value in rows:
+                        text = by_key[key]
+                        found[text] = json.loads(value)
+                        self._remember(text, found[text])
+                        self.disk_hits += 1
+            self.misses += sum(1 for text in missing if text not in found)
+        return found
+
+    def put_many(self, results):
+        """Caches the {text: value} results in both tiers"""
+        with self._lock:
+            for text, value in results.items():
+                self._remember(text, value)
+            if self._db is not None and results:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO sentences (key, value) VALUES (?, ?)",
+                    [(self._key(text), json.dumps(value)) for text, value in results.items()],
+                )
+                self._db.commit()
+
+    def stats(self):
+        """Hit and miss counters of distinct sentences since the cache was created"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits, "disk_hits": self.disk_hits, "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+def cached_map(texts, compute, cache=None, name="Sentence"):
+    """
+    compute(distinct texts) -> their results, run only on the distinct texts missing from the
+    cache (on all distinct texts without one). Returns the result of every text in order and
+    prints the hit rate of the call.
+
+    """
+    texts = list(texts)
+    distinct = list(dict.fromkeys(texts))
+    results = cache.get_many(distinct) if cache is not None else {}
+    hits = len(results)
+    missing = [text for text in distinct if text not in results]
+    if missing:
+        computed = dict(zip(missing, compute(missing)))
+        if cache is not None:
+            cache.put_many(computed)
+        results.update(computed)
+
+    if cache is not None:
+        rate = hits / len(distinct) if distinct else 0.0
+        print(f"{name} cache: {len(texts)} sentences, {len(distinct)} distinct, "
+              f"{hits} cached ({rate:.1%} hit rate), {len(missing)} computed")
+    return [results[text] for text in texts]
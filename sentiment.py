@@ -0,0 +1,89 @@
+import os
+import time
+
+from sentence_cache import cached_map
+
+SENTIMENT_MODEL = "nlptown/bert-base-multilingual-uncased-sentiment"
+
+
+def star_to_sentiment(label):
+    if "1" in label or "2" in label:
+        return "Negative"
+    elif "3" in label:
+        return "Neutral"
+    else:
+        return "Positive"
+
+
+def load_sentiment_pipeline(model=SENTIMENT_MODEL):
+    """
+    Builds the star rating text-classification pipeline. transformers is imported here and
+    not at module level, importing it alone takes several seconds.
+
+    """
+    from transformers import pipeline
+
+    start = time.perf_counter()
+    pipe = pipeline("text-classification", model=model)
+    print(f"Sentiment model {model} loaded in {time.perf_counter() - start:.2f}s")
+    return pipe
+
+
+def sentiment_revision(model=SENTIMENT_MODEL, revision="main"):
+    """
+    Commit hash of the snapshot of the model in the local Hugging Face cache, the one
+    load_sentiment_pipeline loads. Read from the cached ref without loading the model, None
+    when the model was never downloaded or huggingface_hub is missing.
+
+    """
+    try:
+        from huggingface_hub import constants
+    except ImportError:
+        return None
+
+    ref = os.path.join(constants.HF_HUB_CACHE, f"models--{model.replace('/', '--')}", "refs", revision)
+    try:
+        with open(ref, encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def sentiment_namespace(pipe):
+    """SentenceCache namespace of the pipeline's results: its model and the model revision"""
+    revision = getattr(pipe.model.config, "_commit_hash", None)
+    return f"sentiment:{pipe.model.name_or_path}:{revision}"
+
+
+def _score_sentences(sentences, pipe, batch_size):
+    """
+    [sentiment, stars] of every sentence. Sentences are sorted by length before batching so
+    that every batch is padded as little as possible.
+
+    """
+    order = sorted(range(len(sentences)), key=lambda i: len(sentences[i]))
+    scores = [None] * len(sentences)
+
+    start = time.perf_counter()
+    for begin in range(0, len(order), batch_size):
+        batch = order[begin:begin + batch_size]
+        predictions = pipe([sentences[i] for i in batch], batch_size=batch_size)
+        for i, prediction in zip(batch, predictions):   # e.g. {'label': '1 star', 'score': 0.7}
+            scores[i] = [star_to_sentiment(prediction['label']), int(prediction['label'].split()[0])]
+    elapsed = time.perf_counter() - start
+
+    rate = len(sentences) / elapsed if elapsed > 0 else 0.0
+    print(f"Sentiment: {len(sentences)} sentences in {elapsed:.2f}s "
+          f"({rate:.1f} sentences/sec, batch size {batch_size})")
+    return scores
+
+
+def batched_sentiment_scores(sentences, pipe, batch_size=32, cache=None):
+    """
+    Runs the star rating pipeline over all sentences in batches and returns the sentiments
+    and stars in the original order. Every distinct sentence goes through the model once, and
+    with a SentenceCache (namespace from sentiment_namespace) only the ones it does not hold.
+
+    """
+    scores = cached_map(sentences, lambda texts: _score_sentences(texts, pipe, batch_size), cache, "Sentiment")
+    return [sentiment for sentiment, _ in scores], [stars for _, stars in scores]
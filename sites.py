@@ -0,0 +1,150 @@
+import datetime
+import re
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from checkpoint import PageCheckpoint, checkpoint_key
+from review_parsers import get_parser
+
+
+class SiteAdapter:
+    """
+    What the scraping core needs to know about one review site: how the URL of each review
+    page is built, which parser reads a page, how its dates are normalized and which columns
+    the rows fill. The fetching, caching, retrying, checkpointing and parsing machinery in
+    scrape.py and async_scrape.py is shared by all sites, a new site only needs a subclass
+    here, its parsers in review_parsers.py and an entry in SITES.
+
+    """
+
+    # key of the site in SITES and review_parsers.PARSERS
+    name = None
+    # substrings of the host names served by the site
+    hosts = ()
+    # columns of the rows the parser returns, Date first
+    columns = ("Date", "Review")
+    # request headers the site wants
+    headers = None
+
+    def page_url(self, webpage, page):
+        """URL of review page number page of the product, webpage ending with its page number"""
+        raise NotImplementedError
+
+    def page_urls(self, webpage, page_number, pages_to_extract):
+        """(page number, URL) of the review pages page_number to pages_to_extract"""
+        return [(page, self.page_url(webpage, page))
+                for page in range(page_number, max(page_number, pages_to_extract) + 1)]
+
+    def parse(self, content, backend=None):
+        """Rows of the reviews of one page, parsed by the "bs4" or "lxml" backend"""
+        return get_parser(self.name, backend)(content)
+
+    def normalize_date(self, text):
+        return text
+
+    def product_id(self, webpage):
+        """Id of the product in the site's URLs, or None"""
+        return None
+
+    def checkpoint(self, webpage):
+        """PageCheckpoint of the product, keyed by its product id"""
+        return PageCheckpoint(checkpoint_key(self.name, self.product_id(webpage), webpage[:-1]))
+
+    def frame(self, rows):
+        """Dataframe of the rows parsed from the pages, with normalized dates"""
+        df = pd.DataFrame(rows, columns=list(self.columns))
+        df["Date"] = [self.normalize_date(x) for x in df["Date"].values]
+        df.dropna(inplace=True)
+        return df
+
+
+def extract_asin_from_url(input_url):
+    """Extract ASIN from Amazon product review URL"""
+    # Pattern to match ASIN in the URL
+    asin_pattern = r'/product-reviews/([A-Z0-9]{10})/'
+    match = re.search(asin_pattern, input_url)
+    if match:
+        return match.group(1)
+    else:
+        raise ValueError("Could not extract ASIN from URL")
+
+
+class AmazonAdapter(SiteAdapter):
+    name = "amazon"
+    hosts = ("amazon.",)
+    columns = ("Date", "Review", "Summary")
+
+    def page_url(self, webpage, page):
+        return webpage[:-1] + str(page)
+
+    def normalize_date(self, text):
+        # "Reviewed in India on 5 March 2024"
+        return ' '.join(text.split()[-3:])
+
+    def product_id(self, webpage):
+        try:
+            return extract_asin_from_url(webpage)
+        except ValueError:
+            return None
+
+
+class FlipkartAdapter(SiteAdapter):
+    name = "flipkart"
+    hosts = ("flipkart.",)
+    columns = ("Date", "Review")
+    headers = {
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
+        'Accept-Language': 'en-US,en;q=0.9',
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36',
+    }
+
+    def page_url(self, webpage, page):
+        webpage = webpage[:-1]
+        if '&page=' not in webpage:
+            webpage = webpage + '&page='
+        return webpage + str(page)
+
+    def normalize_date(self, text):
+        # Flipkart shows recent dates relative to today, "5 months ago", "3 days ago", "Today"
+        if 'months ago' in text.lower() or 'month ago' in text.lower():
+            match = re.search(r'\d+', text)
+            if match:  # Ensure there is a match
+                number = int(match.group(0))  # Extract the first matched number
+                months_ago = datetime.date.today() - relativedelta(months=number)
+                return months_ago.strftime('%B, %Y')
+
+        elif 'days ago' in text.lower() or 'day ago' in text.lower() or 'today' in text.lower():
+            return datetime.date.today().strftime('%B, %Y')
+
+        else:
+            return text
+
+    def product_id(self, webpage):
+        return parse_qs(urlparse(webpage).query).get('pid', [None])[0]
+
+
+AMAZON = AmazonAdapter()
+FLIPKART = FlipkartAdapter()
+
+SITES = {site.name: site for site in (AMAZON, FLIPKART)}
+
+
+def get_site(name):
+    """SiteAdapter registered in SITES under name"""
+    try:
+        return SITES[name]
+    except KeyError:
+        raise ValueError(f"No site adapter for {name!r}") from None
+
+
+def site_for_url(url, default=None):
+    """SiteAdapter serving url, by its host name, else default (ValueError when there is none)"""
+    host = urlparse(url).netloc.lower()
+    for site in SITES.values():
+        if any(part in host for part in site.hosts):
+            return site
+    if default is None:
+        raise ValueError(f"No site adapter for {url}")
+    return default